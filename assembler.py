@@ -1,14 +1,21 @@
 import sys
 import os
+import argparse
+import marshal
+import itertools
+import collections
+import functools
 import parse
 import generate
+import output
+import backends
+import diagnostics
+import profiling
 
-
-try:
-    assembly_file = sys.argv[1]
-except:
-    print('ERROR: you must supply the path to an assembly file')
-    sys.exit(1)
+VERSION = '1.0'
+SPILL_BATCH = 4096
+COPY_BYTES = 1024 * 1024
+PARSE_CHUNK = 16384 # source lines per parallel parsing job
 
 
 def sanitize_line(line):
@@ -23,43 +30,513 @@ def sanitize_line(line):
     return line
 
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description='Assemble a CS3220 source file into a MIF image')
+    parser.add_argument('assembly_file', nargs='?', help='path to an assembly file')
+    parser.add_argument('-o', '--output', help='write the image to this file instead of stdout')
+    parser.add_argument('--symbols', metavar='PATH', help='also write a symbol map (.sym) with each symbol\'s kind, value, defining and referencing lines')
+    parser.add_argument('--line-map', metavar='PATH', help='also write a binary address-to-source-line map, for hotspots.py')
+    parser.add_argument('--error-format', choices=('text', 'json'), default='text', help='report errors as text lines or as one JSON document (default: text)')
+    parser.add_argument('--format', choices=sorted(backends.BACKENDS), default='mif', help='output format (default: mif)')
+    parser.add_argument('--parser', choices=sorted(parse.ENGINES), default='table', help='parsing engine (default: table)')
+    parser.add_argument('--batch', metavar='DIR|GLOB', help='assemble every matching source file')
+    parser.add_argument('--out-dir', help='directory for output files in batch and watch modes (default: next to each source)')
+    parser.add_argument('--watch', action='store_true', help='reassemble incrementally whenever the source file changes')
+    parser.add_argument('--serve', action='store_true', help='assemble requests from client.py over a Unix socket until interrupted')
+    parser.add_argument('--socket', help='socket path for --serve (default: $CS3220_ASM_SOCKET, or one per user under $TMPDIR or /tmp)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes in batch and serve modes')
+    parser.add_argument('--parse-workers', type=int, default=1, help='parse the source in chunks across this many processes; 0 for one per CPU (default: 1)')
+    parser.add_argument('--encoder', choices=sorted(generate.ENCODERS), default='scalar', help='second pass encoder; bulk encodes columns of fields at once (default: scalar)')
+    parser.add_argument('--depth', type=int, default=generate.DEPTH, help='memory depth in words (default: {0})'.format(generate.DEPTH))
+    parser.add_argument('--width', type=int, default=generate.WIDTH, help='memory width in bits (default: {0})'.format(generate.WIDTH))
+    parser.add_argument('--no-cache', action='store_true', help='always assemble, bypassing the on-disk cache')
+    parser.add_argument('--stats', action='store_true', help='print per-phase timing, counts and peak memory as JSON to stderr')
+    parser.add_argument('--profile', metavar='PATH', help='write a cProfile dump of the run to PATH')
+    parser.add_argument('--cache-stats', action='store_true', help='print cache hit/miss counters and exit')
+    args = parser.parse_args()
+
+    if not args.assembly_file and not args.batch and not args.cache_stats and not args.serve:
+        parser.error('you must supply the path to an assembly file')
+
+    if args.depth < 1:
+        parser.error('--depth must be at least 1')
+
+    if args.width < generate.WIDTH:
+        parser.error('--width must be at least {0} bits'.format(generate.WIDTH))
+
+    return args
+
+
+def read_tokens(lines, engine='table', diagnostics=None, line_num=1):
+    for line in lines:
+        try:
+            sanitized = sanitize_line(line)
+
+            if sanitized:
+                token = parse.parse_line(sanitized, line_num, engine, diagnostics)
+
+                if token is not None: # recorded in diagnostics; the line is skipped
+                    yield token
+        except parse.ParseException as e:
+            raise parse.ParseException('Error at line number {0}: {1}, {2}'.format(line_num, line.strip(), str(e)))
+
+        line_num += 1
+
+
+def parse_chunk(lines, line_num, engine='table', collect=True, count=False):
+    # runs in a worker: -> (marshalled (pass 1 records, spill items, tokens parsed), errors as
+    # (line, message, text, offset), or the message of the ParseException read_tokens raised
+    # when not collecting). compact runs here too, so an instruction it encodes reaches the
+    # parent as its word, and first_pass as a bare INST record without operands, which it
+    # would only have scanned for symbols
+    found = diagnostics.Diagnostics() if collect else None
+    records = []
+    items = []
+    tokens = 0
+
+    try:
+        for token in read_tokens(lines, engine, found, line_num):
+            item = generate.compact(token)
+
+            if count:
+                tokens += profiling.token_count(token)
+
+            if type(item) == int:
+                records.append((None, token.kind, (), token.line_num, token.text))
+                items.append(item)
+            else:
+                record = token.to_record()
+                records.append(record)
+
+                if item is not None:
+                    items.append(record)
+    except parse.ParseException as e:
+        return None, [], str(e)
+
+    errors = [(entry.line_num, entry.message, entry.text, entry.offset) for entry in found or ()]
+    return marshal.dumps((records, items, tokens)), errors, None
+
+
+def merge_chunk(result, diagnostics=None):
+    # -> (tokens for first_pass, spill items, tokens parsed) of one chunk
+    data, errors, message = result
+
+    if message is not None:
+        raise parse.ParseException(message)
+
+    for error in errors:
+        diagnostics.error(*error)
+
+    records, items, tokens = marshal.loads(data)
+    return [parse.Token.from_record(record) for record in records], items, tokens
+
+
+def parse_parallel(lines, engine='table', diagnostics=None, workers=None, count=False):
+    # parses and compacts chunks of lines across a process pool, yielding each chunk's
+    # merge_chunk result in source order; no more than two chunks per worker are in
+    # flight, so memory stays bounded however long the source
+    lines = iter(lines)
+    chunks = iter(lambda: list(itertools.islice(lines, PARSE_CHUNK)), [])
+    first = next(chunks, [])
+    second = next(chunks, None)
+
+    if second is None: # a single chunk is not worth starting a pool for
+        yield merge_chunk(parse_chunk(first, 1, engine, diagnostics is not None, count), diagnostics)
+        return
+
+    import concurrent.futures # as in batch, kept off the startup path
+
+    workers = workers or os.cpu_count()
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        line_num = 1
+
+        for chunk in itertools.chain((first, second), chunks):
+            pending.append(executor.submit(parse_chunk, chunk, line_num, engine, diagnostics is not None, count))
+            line_num += len(chunk)
+
+            if len(pending) >= workers * 2:
+                yield merge_chunk(pending.popleft().result(), diagnostics)
+
+        while pending:
+            yield merge_chunk(pending.popleft().result(), diagnostics)
+
+
+class TokenSpill(object):
+    # feeds first_pass the tokens as they are parsed, while compact's items are written
+    # aside in batches for the second pass to replay; chunks from parse_parallel arrive
+    # with their items already compacted
+    def __init__(self, tokens=None, chunks=None):
+        self.tokens = tokens
+        self.chunks = chunks
+        self.spill = None # a temporary file, created once the first batch fills
+        self.tail = [] # the last, partial batch, which stays in memory
+        self.spilled = False
+
+
+    def __iter__(self):
+        if self.spilled:
+            return self.replay()
+        elif self.chunks is not None:
+            return self.record_chunks()
+        else:
+            return self.record()
+
+
+    def record(self):
+        batch = []
+
+        for token in self.tokens:
+            item = generate.compact(token)
+
+            if item is not None:
+                batch.append(item if type(item) == int else item.to_record())
+
+            if len(batch) == SPILL_BATCH:
+                self.dump(batch)
+                batch = []
+
+            yield token
+
+        self.tail = batch
+        self.spilled = True
+
+
+    def record_chunks(self):
+        batch = []
+
+        for tokens, items, _ in self.chunks:
+            batch.extend(items)
+
+            if len(batch) >= SPILL_BATCH:
+                self.dump(batch)
+                batch = []
+
+            yield from tokens
+
+        self.tail = batch
+        self.spilled = True
+
+
+    def dump(self, batch):
+        import pickle # with tempfile, only for programs over one batch
+
+        if self.spill is None:
+            import tempfile
+            self.spill = tempfile.TemporaryFile()
+
+        pickle.dump(batch, self.spill, pickle.HIGHEST_PROTOCOL)
+
+
+    def batches(self):
+        if self.spill is not None:
+            import pickle
+            self.spill.seek(0)
+
+            while True:
+                try:
+                    yield pickle.load(self.spill)
+                except EOFError:
+                    break
+
+        yield self.tail
+
+
+    def replay(self):
+        for batch in self.batches():
+            for item in batch:
+                yield item if type(item) == int else parse.Token.from_record(item)
+
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+
+
+class Assembler(object):
+    def __init__(self, engine='table', depth=generate.DEPTH, width=generate.WIDTH):
+        self.engine = engine
+        self.depth = depth
+        self.width = width
+
+
+    def assemble(self, source):
+        return generate.assemble(list(read_tokens(source.splitlines(), self.engine)), self.depth, self.width)
+
+
+    def assemble_file(self, assembly_file):
+        if not os.path.exists(assembly_file):
+            raise Exception('No file found at {0}'.format(assembly_file))
+
+        with open(assembly_file) as f:
+            return generate.assemble(list(read_tokens(f, self.engine)), self.depth, self.width)
+
+
+def assemble(source, engine='table', depth=generate.DEPTH, width=generate.WIDTH):
+    return Assembler(engine, depth, width).assemble(source)
+
+
+@functools.lru_cache(None)
+def version():
+    import glob
+    import hashlib
+
+    digest = hashlib.sha256(VERSION.encode())
+
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+def spill_tokens(lines, engine='table', found=None, stats=profiling.NO_STATS, workers=1):
+    lines = stats.phase('read', lines)
+
+    if workers == 1:
+        return TokenSpill(stats.phase('parse', read_tokens(lines, engine, found), 'tokens', profiling.token_count))
+
+    # with workers, the parse phase counts chunks, and each adds the tokens it parsed
+    chunks = parse_parallel(lines, engine, found, workers, stats is not profiling.NO_STATS)
+    return TokenSpill(chunks=stats.phase('parse', chunks, 'tokens', lambda chunk: chunk[2]))
+
+
+def assemble_lines(lines, engine='table', options=None, path=None, stats=None, workers=1):
+    stats = stats or profiling.NO_STATS
+    found = diagnostics.Diagnostics(path)
+    tokens = spill_tokens(lines, engine, found, stats, workers)
+
+    try:
+        yield from stats.phase('format', generate.generate_lines(tokens, diagnostics=found, stats=stats, **(options or {})))
+    finally:
+        tokens.close()
+
+
+def assemble_image(lines, engine='table', options=None, path=None, stats=None, workers=1):
+    stats = stats or profiling.NO_STATS
+    found = diagnostics.Diagnostics(path)
+    tokens = spill_tokens(lines, engine, found, stats, workers)
+
+    try:
+        return generate.assemble(tokens, diagnostics=found, stats=stats, **(options or {}))
+    finally:
+        tokens.close()
+
+
+def render_output(lines, engine='table', options=None, fmt='mif', path=None, stats=None, workers=1):
+    stats = stats or profiling.NO_STATS
+
+    if fmt == 'mif':
+        return ''.join(line + '\n' for line in assemble_lines(lines, engine, options, path, stats, workers)).encode()
+    else:
+        return stats.call('format', backends.render, assemble_image(lines, engine, options, path, stats, workers), fmt, size=len)
+
+
+def assemble_output(assembly_file, engine='table', cache=None, options=None, fmt='mif', stats=None, workers=1):
+    stats = stats or profiling.NO_STATS
+
+    with open(assembly_file, 'rb') as f:
+        source = f.read()
+
+    if cache:
+        key = cache.key(source, version(), dict(options or {}, format=fmt))
+        data = cache.get(key)
+        stats.count('cache_hits' if data is not None else 'cache_misses')
+
+        if data is not None:
+            return data
+
+    data = render_output(source.decode().splitlines(), engine, options, fmt, assembly_file, stats, workers)
+
+    if cache:
+        cache.put(key, data)
+
+    return data
+
+
+def write_bytes(data, output_file=None):
+    if output_file:
+        output.write_atomic(output_file, data)
+    else:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(data)
+
+
+def copy_blocks(f, out):
+    for block in iter(lambda: f.read(COPY_BYTES), b''):
+        out.write(block)
+
+
+def copy_file(f, output_file=None):
+    # -> bytes copied from the binary file f to output_file, or stdout
+    if output_file:
+        with output.open_atomic(output_file, 'wb') as out:
+            copy_blocks(f, out)
+    else:
+        sys.stdout.flush()
+        copy_blocks(f, sys.stdout.buffer)
+
+    return f.tell()
+
+
+def write_assembly(assembly_file, engine='table', options=None, output_file=None, fmt='mif', stats=None, workers=1):
+    stats = stats or profiling.NO_STATS
+
+    with open(assembly_file) as f:
+        if fmt == 'mif':
+            lines = assemble_lines(f, engine, options, assembly_file, stats, workers)
+            stats.call('write', output.write_output, lines, output_file, sys.stdout, size=lambda _: stats.phases['format'].items)
+        else:
+            image = assemble_image(f, engine, options, assembly_file, stats, workers)
+            stats.call('write', backends.write, image, fmt, output_file, size=lambda _: generate.image_words(image.memory))
+
+
+def main(assembly_file, engine='table', cache=None, options=None, output_file=None, fmt='mif', stats=None, workers=1):
+    stats = stats or profiling.NO_STATS
+
     if not os.path.exists(assembly_file):
         raise Exception('No file found at {0}'.format(assembly_file))
 
-    tokens = []
-    line_num = 1
+    if not cache:
+        write_assembly(assembly_file, engine, options, output_file, fmt, stats, workers)
+        return
+
+    key = cache.key_file(assembly_file, version(), dict(options or {}, format=fmt))
+    entry = cache.open_entry(key)
+    missed = entry is None
+    stats.count('cache_misses' if missed else 'cache_hits')
+
+    if missed:
+        # a miss streams the output into the cache entry, just as --no-cache streams it to
+        # the destination, so neither the source nor the output is ever held in memory
+        write_assembly(assembly_file, engine, options, cache.entry_path(key), fmt, stats, workers)
+        entry = open(cache.path(key), 'rb')
+
+    with entry:
+        stats.call('copy', copy_file, entry, output_file, size=int)
+
+    if missed: # a hit adds nothing, so only a miss can take the cache over its limit
+        cache.evict()
+
+
+def write_symbols(assembly_file, path, engine='table', options=None):
+    symbols = generate.Symbols()
+
+    with open(assembly_file) as f:
+        generate.first_pass(read_tokens(f, engine), symbols, (options or {}).get('depth', generate.DEPTH))
+
+    output.write_output(generate.symbol_lines(symbols), path)
+
+
+def write_line_map(assembly_file, path, engine='table', options=None):
+    import linemap
+
+    symbols = generate.Symbols()
+
+    # read twice, streaming, rather than holding every token of a large program at once
+    with open(assembly_file) as f:
+        generate.first_pass(read_tokens(f, engine), symbols, (options or {}).get('depth', generate.DEPTH))
+
+    labels = {name: int(address / 4) for name, address in symbols.labels.items()}
 
     with open(assembly_file) as f:
-        for line in f:
-            try:
-                sanitized = sanitize_line(line)
+        line_map = linemap.LineMap.build(generate.word_lines(read_tokens(f, engine)), labels)
+
+    with output.open_atomic(path, 'wb') as f:
+        line_map.write(f)
+
+
+ERRORS = (parse.ParseException, generate.UndefinedSymbolException, generate.SemanticException, diagnostics.AssemblyException)
+
 
-                if sanitized:
-                    tokens.append(parse.parse_line(sanitized, line_num))
-            except parse.ParseException as e:
-                raise parse.ParseException('Error at line number {0}: {1}, {2}'.format(line_num, line.strip(), str(e)))
+def describe_error(e):
+    if isinstance(e, diagnostics.AssemblyException):
+        return '\n'.join(e.diagnostics.lines())
+    elif isinstance(e, generate.UndefinedSymbolException):
+        return 'Undefined error at line {0}: {1}\nLine contains: {2}'.format(e.token.line_num, e.token.text, str(e))
+    elif isinstance(e, generate.SemanticException):
+        return 'Semantic error at line {0}: {1}\nLine contains: {2}'.format(e.token.line_num, e.token.text, str(e))
+    else:
+        return 'Error: {0}'.format(str(e))
 
-            line_num += 1
 
-    generate.generate(tokens)
+def error_json(e):
+    if isinstance(e, diagnostics.AssemblyException):
+        return e.diagnostics.json()
+
+    found = diagnostics.Diagnostics()
+    token = getattr(e, 'token', None)
+    found.error(token.line_num if token else None, str(e), token.text if token else None)
+    return found.json()
 
 
 if __name__ == '__main__':
+    args = parse_args()
+
+    asm_cache = None
+
+    if not args.no_cache:
+        import cache # this and the other mode-specific modules are imported where used
+
+        asm_cache = cache.Cache()
+
+    options = {'depth': args.depth, 'width': args.width, 'encoder': args.encoder}
+
+    if args.cache_stats:
+        stats = asm_cache.stats() if asm_cache else {}
+        print('cache hits: {0}, misses: {1}'.format(stats.get('hits', 0), stats.get('misses', 0)))
+        sys.exit(0)
+
+    run_stats = profiling.Stats() if args.stats else None
+    profiler = None
+
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
     try:
-        main()
-    except parse.ParseException as e:
-        print('Error: {0}'.format(str(e)), file=sys.stderr)
-        sys.exit(1)
-    except generate.UndefinedSymbolException as e:
-        line_num = e.token.attributes.get('line_num')
-        text = e.token.attributes.get('text')
-        print('Undefined error at line {0}: {1}'.format(line_num, text), file=sys.stderr)
-        print('Line contains: {0}'.format(str(e)), file=sys.stderr)
-        sys.exit(1)
-    except generate.SemanticException as e:
-        line_num = e.token.attributes.get('line_num')
-        text = e.token.attributes.get('text')
-        print('Semantic error at line {0}: {1}'.format(line_num, text), file=sys.stderr)
-        print('Line contains: {0}'.format(str(e)), file=sys.stderr)
+        if args.serve:
+            import server # asyncio is slow to import, and only the daemon needs it
+
+            server.serve(args.socket or server.SOCKET, args.parser, asm_cache, options, args.jobs)
+            sys.exit(0)
+
+        if args.watch:
+            import batch
+            import incremental
+
+            destination = args.output or batch.output_path(args.assembly_file, args.out_dir, backends.EXTENSIONS[args.format])
+            incremental.watch(args.assembly_file, destination, args.parser, options, args.format)
+            sys.exit(0)
+
+        if args.batch:
+            import batch
+
+            sys.exit(0 if batch.run(args.batch, args.out_dir, args.jobs, args.parser, asm_cache, options, args.format) else 1)
+
+        main(args.assembly_file, args.parser, asm_cache, options, args.output, args.format, run_stats, args.parse_workers)
+
+        if args.symbols:
+            write_symbols(args.assembly_file, args.symbols, args.parser, options)
+
+        if args.line_map:
+            write_line_map(args.assembly_file, args.line_map, args.parser, options)
+    except ERRORS as e:
+        print(error_json(e) if args.error_format == 'json' else describe_error(e), file=sys.stderr)
         sys.exit(1)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+
+        if run_stats:
+            import json
+
+            report = dict(run_stats.report(), file=args.assembly_file, format=args.format, parser=args.parser, encoder=args.encoder)
+            print(json.dumps(report, indent=2), file=sys.stderr)
+
+        if asm_cache and not args.batch and not args.serve:
+            asm_cache.save_stats()
@@ -0,0 +1,124 @@
+import io
+import sys
+import array
+import generate
+import output
+
+
+WORD_TYPE = 'I' if array.array('I').itemsize == 4 else 'L'
+IHEX_RECORD_BYTES = 16
+
+
+def word_bytes(words, width):
+    if width == 32:
+        words = array.array(WORD_TYPE, words)
+
+        if sys.byteorder != 'little':
+            words.byteswap()
+
+        return words.tobytes()
+
+    size = (width + 7) // 8
+    return b''.join(word.to_bytes(size, 'little') for word in words)
+
+
+def write_mif(image, f):
+    output.write_lines(generate.mif_lines(image.memory.runs(), image.depth, image.width), f)
+
+
+def write_bin(image, f):
+    memory = image.memory
+    fill = word_bytes([memory.fill], image.width)
+    end = 0
+
+    for start, segment in zip(memory.starts, memory.segments):
+        f.write(fill * (start - end))
+        f.write(word_bytes(segment, image.width))
+        end = start + len(segment)
+
+    f.write(fill * (image.depth - end))
+
+
+def ihex_record(address, record_type, data=b''):
+    record = bytes([len(data), (address >> 8) & 0xFF, address & 0xFF, record_type]) + data
+    return ':' + (record + bytes([-sum(record) & 0xFF])).hex().upper()
+
+
+def ihex_lines(image):
+    upper = 0
+    size = (image.width + 7) // 8
+
+    for start, segment in zip(image.memory.starts, image.memory.segments):
+        data = word_bytes(segment, image.width)
+        address = start * size
+        offset = 0
+
+        while offset < len(data):
+            if address >> 16 != upper:
+                upper = address >> 16
+                yield ihex_record(0, 0x04, upper.to_bytes(2, 'big'))
+
+            count = min(IHEX_RECORD_BYTES, len(data) - offset, 0x10000 - (address & 0xFFFF))
+            yield ihex_record(address & 0xFFFF, 0x00, data[offset:offset + count])
+            address += count
+            offset += count
+
+    yield ihex_record(0, 0x01)
+
+
+def write_ihex(image, f):
+    output.write_lines(ihex_lines(image), f)
+
+
+def memh_lines(image):
+    word = '{{0:0{0}x}}'.format((image.width + 3) // 4)
+
+    for start, segment in zip(image.memory.starts, image.memory.segments):
+        yield '@{0:x}'.format(start)
+
+        for value in segment:
+            yield word.format(value)
+
+
+def write_memh(image, f):
+    output.write_lines(memh_lines(image), f)
+
+
+# format -> (file mode, writer); ihex and verilog-memh only list written words,
+# unwritten addresses are left to the loader rather than filled
+BACKENDS = {
+    'mif': ('w', write_mif),
+    'bin': ('wb', write_bin),
+    'ihex': ('w', write_ihex),
+    'verilog-memh': ('w', write_memh),
+}
+
+EXTENSIONS = {
+    'mif': '.mif',
+    'bin': '.bin',
+    'ihex': '.hex',
+    'verilog-memh': '.memh',
+}
+
+
+def render(image, fmt='mif'):
+    mode, write = BACKENDS[fmt]
+
+    if mode == 'wb':
+        f = io.BytesIO()
+        write(image, f)
+        return f.getvalue()
+
+    f = io.StringIO()
+    write(image, f)
+    return f.getvalue().encode()
+
+
+def write(image, fmt='mif', path=None):
+    mode, writer = BACKENDS[fmt]
+
+    if path:
+        with output.open_atomic(path, mode) as f:
+            writer(image, f)
+    else:
+        writer(image, sys.stdout.buffer if mode == 'wb' else sys.stdout)
@@ -0,0 +1,71 @@
+import os
+import sys
+import glob
+import assembler
+import backends
+import diagnostics
+
+
+SOURCE_PATTERN = '*.a32'
+
+
+def find_sources(pattern):
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, SOURCE_PATTERN)
+
+    return sorted(glob.glob(pattern))
+
+
+def output_path(source, out_dir, extension='.mif'):
+    name = os.path.splitext(os.path.basename(source))[0] + extension
+    return os.path.join(out_dir or os.path.dirname(source), name)
+
+
+def assemble_job(source, destination, engine, cache=None, options=None, fmt='mif'):
+    hits = cache.hits if cache else 0
+
+    try:
+        assembler.main(source, engine, cache, options, destination, fmt)
+        error = None
+    except diagnostics.AssemblyException as e:
+        error = assembler.describe_error(e) # each line already names the source
+    except Exception as e:
+        error = '{0}: {1}'.format(source, assembler.describe_error(e))
+
+    return error, (cache.hits - hits) if cache else 0
+
+
+def run(pattern, out_dir=None, workers=None, engine='table', cache=None, options=None, fmt='mif'):
+    sources = find_sources(pattern)
+
+    if not sources:
+        print('Error: no files match {0}'.format(pattern), file=sys.stderr)
+        return False
+
+    destinations = [output_path(source, out_dir, backends.EXTENSIONS[fmt]) for source in sources]
+    failures = 0
+    hits = 0
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    if workers == 1 or len(sources) <= 1:
+        results = [assemble_job(source, destination, engine, cache, options, fmt) for source, destination in zip(sources, destinations)]
+    else:
+        import concurrent.futures # only batches need it, and it pulls in logging at startup
+
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(assemble_job, sources, destinations, [engine] * len(sources), [cache] * len(sources), [options] * len(sources), [fmt] * len(sources)))
+
+    for source, (error, hit) in zip(sources, results):
+        hits += hit
+
+        if error:
+            failures += 1
+            print(error, file=sys.stderr)
+
+    if cache:
+        cache.save_stats(hits, len(sources) - hits)
+
+    print('{0} assembled, {1} failed'.format(len(sources) - failures, failures), file=sys.stderr)
+    return failures == 0
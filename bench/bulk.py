@@ -0,0 +1,70 @@
+import os
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import parse
+import generate
+import assembler
+import encode
+
+
+DEPTH = 1 << 24 # room for every generated program and its .ORIG gaps
+
+
+def program(count):
+    # .WORD values and an .ORIG gap alongside the instruction mix, so both encoders
+    # see every kind of token that produces a word
+    tokens = encode.program(count // 2)
+    tokens.append(parse.parse_line('.NAME datum=0xDEADBEEF', len(tokens)))
+    tokens.append(parse.parse_line('.WORD datum', len(tokens)))
+    tokens.append(parse.parse_line('.ORIG 0x{0:x}'.format(count * 4), len(tokens)))
+    return tokens + encode.program(count // 2, count)
+
+
+def check_parity(tokens, width=generate.WIDTH, spilled=False):
+    symbols = generate.Symbols()
+    generate.first_pass(tokens, symbols, DEPTH)
+
+    if spilled: # as pass 2 replays them from a TokenSpill
+        tokens = [token for token in map(generate.compact, tokens) if token is not None]
+
+    scalar = generate.second_pass(tokens, symbols, width)
+    bulk = generate.bulk_second_pass(tokens, symbols, width)
+    assert (scalar.starts, scalar.segments) == (bulk.starts, bulk.segments), 'bulk encoder disagrees with second_pass'
+
+
+def best_of(encode_pass, tokens, symbols, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode_pass(tokens, symbols)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main(count=262144, repeat=5, sources=None):
+    for path in sources or []:
+        with open(path) as f:
+            check_parity(list(assembler.read_tokens(f)))
+
+    tokens = program(count)
+    check_parity(tokens)
+    check_parity(tokens, 64)
+    check_parity(tokens, spilled=True)
+
+    symbols = generate.Symbols()
+    generate.first_pass(tokens, symbols, DEPTH)
+    scalar = best_of(generate.second_pass, tokens, symbols, repeat)
+    bulk = best_of(generate.bulk_second_pass, tokens, symbols, repeat)
+    backend = 'numpy' if generate.load_numpy() is not None else 'array'
+    print('{0} tokens: scalar {1:.0f}ms, bulk ({2}) {3:.0f}ms ({4:.2f}x)'.format(len(tokens), scalar * 1000, backend, bulk * 1000, scalar / bulk))
+
+
+if __name__ == '__main__':
+    main(sources=[path for pattern in sys.argv[1:] for path in glob.glob(pattern)])
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import generate
+import image
+import output
+import compare
+
+
+DEPTH = 1 << 20
+
+
+def write_image(path, items, depth=DEPTH):
+    with open(path, 'w') as f:
+        output.write_lines(generate.mif_lines(image.runs(items), depth), f)
+
+
+def main(repeat=5):
+    # a 4K-word program at the bottom of a 1M-word memory; the second image changes a
+    # few words, zeroes a run of the fill and is declared 16 words shorter
+    program = [(i, (i * 2654435761) & 0xFFFFFFFF) for i in range(4096)]
+    changed = dict(program)
+    changed.update({100: 0, 101: 0, 102: 0, 3000: 1})
+    changed.update((i, 0) for i in range(5000, 6000))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path1 = os.path.join(directory, 'a.mif')
+        path2 = os.path.join(directory, 'b.mif')
+        write_image(path1, program)
+        write_image(path2, sorted(changed.items()), DEPTH - 16)
+        best = None
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            headers, found = compare.compare(path1, path2)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+    described = headers + [compare.describe_conflict(*conflict) for conflict in found]
+    assert len(described) == 7, described
+    assert 'conflict at addresses [00001388..0000176f], file 1 had deaddead and file 2 had 00000000' in described, described
+    print('\n'.join(described))
+    print('{0}-word images: {1:.1f}ms'.format(DEPTH, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
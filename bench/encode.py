@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import isa
+import parse
+import generate
+
+
+SOURCE = [
+    '.NAME size=0x40',
+    'loop:',
+    'BEQ T0,T1,done',
+    'BLT A0,A1,loop',
+    'LW T0,size(SP)',
+    'LBU S1,4(FP)',
+    'SW A2,size(GP)',
+    'SD RV,-8(SP)',
+    'ADDI T0,T0,-1',
+    'XORI S0,S1,size',
+    'ADD T0,T1,T2',
+    'NXOR A3,A4,A5',
+    'LE RV,A0,A1',
+    'JAL RA,16(Zero)', # a label's word index outgrows the 14-bit immediate in large programs
+    'done:',
+    'NE T3,T4,T5',
+]
+
+
+# the opcode tests the ENCODINGS table replaced: one is_type per mnemonic, in the order
+# the old get_primary_opcode and get_secondary_opcode elif chains tried them
+LEGACY_OPCODES = [(parse.OPS[mnemonic], primary_opcode, secondary_opcode) for mnemonic, (_, primary_opcode, secondary_opcode) in isa.INSTRUCTIONS.items()]
+
+
+def legacy_opcodes(op_token):
+    for op, primary_opcode, secondary_opcode in LEGACY_OPCODES:
+        if op_token.is_type(op):
+            return primary_opcode, secondary_opcode
+
+    raise Exception('Unrecognized opcode')
+
+
+def legacy_encode(symbols, token, index):
+    # the if/elif second_pass body from before ENCODINGS, on the current symbol table
+    op_token = token.tokens[0]
+    primary_opcode, secondary_opcode = legacy_opcodes(op_token)
+
+    if token.is_type(parse.INST_FUNCR):
+        regno_d = token.tokens[1].value
+        regno_s = token.tokens[2].value
+        regno_t = token.tokens[3].value
+        return 0 | (regno_s << 20) | (regno_t << 14) | (regno_d << 8) | secondary_opcode
+
+    if token.is_type(parse.INST_STORE) or token.is_type(parse.INST_LOAD) or token.is_type(parse.INST_JUMP):
+        regno_t = token.tokens[1].value
+        regno_s = token.tokens[2].tokens[1].value
+        imm_token = token.tokens[2].tokens[0]
+    elif token.is_type(parse.INST_FUNCI):
+        regno_t = token.tokens[1].value
+        regno_s = token.tokens[2].value
+        imm_token = token.tokens[3]
+    elif token.is_type(parse.INST_BRANCH):
+        regno_t = token.tokens[2].value
+        regno_s = token.tokens[1].value
+        imm_token = token.tokens[3]
+    else:
+        raise Exception('Unrecognized instruction type')
+
+    if token.is_type(parse.INST_BRANCH):
+        imm = int(generate.lookup_label(symbols, token, imm_token.value) / 4) - index - 1
+    elif token.is_type(parse.INST_STORE):
+        imm = generate.lookup_name(symbols, token, imm_token.value) if imm_token.is_type(parse.IDENTIFIER) else imm_token.value
+    elif token.is_type(parse.INST_JUMP):
+        imm = int(generate.lookup_label(symbols, token, imm_token.value) / 4) if imm_token.is_type(parse.IDENTIFIER) else imm_token.value
+    else:
+        imm = symbols.get(imm_token.value).value if imm_token.is_type(parse.IDENTIFIER) else imm_token.value
+
+    return 0 | (primary_opcode << 26) | (regno_s << 20) | (regno_t << 14) | (imm & isa.IMM_MASK)
+
+
+def legacy_second_pass(tokens, symbols):
+    instructions = []
+
+    for token in tokens:
+        if token.is_type(parse.DIR_WORD):
+            instructions.append(generate.lookup_name(symbols, token, token.value))
+        elif token.is_type(parse.INST):
+            instructions.append(legacy_encode(symbols, token, len(instructions)))
+
+    return instructions
+
+
+def best_of(encode, tokens, symbols, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(tokens, symbols)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def program(count, first_block=0):
+    tokens = [parse.parse_line('ADD Zero,Zero,Zero', 0)]
+
+    while len(tokens) < count:
+        block = first_block + len(tokens)
+
+        for line in SOURCE:
+            for symbol in ('loop', 'done', 'size'): # each block defines its own symbols
+                line = line.replace(symbol, symbol + str(block))
+            tokens.append(parse.parse_line(line, len(tokens)))
+
+    return tokens
+
+
+def main(count=16384, repeat=20):
+    tokens = program(count)
+    symbols = generate.Symbols()
+    generate.first_pass(tokens, symbols)
+    instructions = sum(1 for token in tokens if token.is_type(parse.INST))
+    assert legacy_second_pass(tokens, symbols) == generate.second_pass(tokens, symbols).words(), 'the encoders disagree'
+
+    legacy = best_of(legacy_second_pass, tokens, symbols, repeat)
+    table = best_of(generate.second_pass, tokens, symbols, repeat)
+    print('{0} instructions: if/elif chains {1:.0f} ns/instruction, ENCODINGS table {2:.0f} ns/instruction ({3:.1f}x)'.format(instructions, legacy / instructions * 1e9, table / instructions * 1e9, legacy / table))
+
+
+if __name__ == '__main__':
+    main()
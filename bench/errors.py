@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import assembler
+import diagnostics
+import synth
+
+
+# (source line, expected 1-based column of the error); each operand also appears earlier
+# in its line, inside a register name or as the mnemonic
+COLUMNS = [
+    ('    LW T0,T(Zero)', 11),
+    ('ADDI T1,T1,T', 12),
+    ('BEQ T0,T0,BEQ', 11),
+    ('.WORD WORD', 7),
+    ('ADDI S1,S1,9000', 12),
+    ('ADDI T0,T1,0x7FFF', 12),
+    ('SW T0,0x2000(Zero)', 7),
+]
+
+
+def check_columns():
+    source = ['ADD:', 'WORD:'] + [line for line, _ in COLUMNS]
+
+    try:
+        assembler.assemble_image(source)
+        assert False, 'the errors were not reported'
+    except diagnostics.AssemblyException as e:
+        e.diagnostics.locate(source)
+        found = [entry.column for entry in e.diagnostics]
+
+    assert found == [column for _, column in COLUMNS], found
+
+
+def main(lines=100000, every=100):
+    check_columns()
+    prog = synth.program(lines)
+
+    for i in range(every, lines, every):
+        prog.lines[i] = 'ADDI T0,T0,undefined{0}'.format(i)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'errors.a32')
+        synth.write_program(path, prog)
+        start = time.perf_counter()
+
+        try:
+            assembler.main(path, options={'depth': prog.depth()}, output_file=os.path.join(directory, 'errors.mif'))
+        except diagnostics.AssemblyException as e:
+            count = len(e.diagnostics)
+
+        elapsed = time.perf_counter() - start
+
+    print('{0} lines, {1} errors collected and located in {2:.2f}s'.format(lines, count, elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
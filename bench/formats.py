@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import array
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import parse
+import generate
+import backends
+import mif
+import encode
+
+
+def mif_words(text):
+    reader = mif.MifReader(io.StringIO(text))
+    words = [None] * reader.depth
+
+    for start, end, value in reader:
+        words[start:end + 1] = [value] * (end - start + 1)
+
+    return words
+
+
+def bin_words(data):
+    words = array.array(backends.WORD_TYPE, data)
+
+    if sys.byteorder != 'little':
+        words.byteswap()
+
+    return list(words)
+
+
+def ihex_words(text, depth, fill):
+    data = bytearray(backends.word_bytes([fill], generate.WIDTH) * depth)
+    upper = 0
+
+    for line in text.splitlines():
+        record = bytes.fromhex(line[1:])
+        assert sum(record) & 0xFF == 0, 'bad checksum: ' + line
+        count, address, record_type = record[0], int.from_bytes(record[1:3], 'big'), record[3]
+
+        if record_type == 0x04:
+            upper = int.from_bytes(record[4:6], 'big') << 16
+        elif record_type == 0x00:
+            data[upper + address:upper + address + count] = record[4:4 + count]
+
+    return bin_words(bytes(data))
+
+
+def memh_words(text, depth, fill):
+    words = [fill] * depth
+    address = 0
+
+    for line in text.splitlines():
+        if line.startswith('@'):
+            address = int(line[1:], 16)
+        else:
+            words[address] = int(line, 16)
+            address += 1
+
+    return words
+
+
+def program(count):
+    # two segments separated by an .ORIG gap, so every writer has a hole to handle
+    tokens = encode.program(count // 2)
+    tokens.append(parse.parse_line('.ORIG 0x{0:x}'.format(count * 4), len(tokens)))
+    return tokens + encode.program(count // 2, count)[1:]
+
+
+def main(count=16384, repeat=10):
+    depth = count * 2
+    memory = generate.assemble(program(count), depth)
+    expected = mif_words(backends.render(memory, 'mif').decode())
+    decoders = {
+        'mif': lambda data: mif_words(data.decode()),
+        'bin': bin_words,
+        'ihex': lambda data: ihex_words(data.decode(), depth, memory.memory.fill),
+        'verilog-memh': lambda data: memh_words(data.decode(), depth, memory.memory.fill),
+    }
+
+    for fmt in sorted(backends.BACKENDS):
+        best = None
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = backends.render(memory, fmt)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        assert decoders[fmt](data) == expected, '{0} does not round-trip against MIF'.format(fmt)
+        print('{0:>12}: {1:.1f}ms, {2} bytes'.format(fmt, best * 1000, len(data)))
+
+
+if __name__ == '__main__':
+    main()
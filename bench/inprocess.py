@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import assembler
+from encode import SOURCE
+
+
+def write_programs(directory, count):
+    paths = []
+
+    for i in range(count):
+        path = os.path.join(directory, 'program{0}.a32'.format(i))
+
+        with open(path, 'w') as f:
+            f.write('.ORIG 0x40\n')
+
+            for block in range(i % 8 + 1): # each block defines its own symbols
+                text = '\n'.join(SOURCE)
+
+                for symbol in ('loop', 'done', 'size'):
+                    text = text.replace(symbol, '{0}{1}_{2}'.format(symbol, i, block))
+
+                f.write(text + '\n')
+
+        paths.append(path)
+
+    return paths
+
+
+def main(count=50):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_programs(directory, count)
+
+        start = time.perf_counter()
+
+        for path in paths: # --no-cache, so every run assembles rather than reading a cached image
+            subprocess.run([sys.executable, os.path.join(ROOT, 'assembler.py'), '--no-cache', path], stdout=subprocess.DEVNULL, check=True)
+
+        subprocess_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asm = assembler.Assembler()
+
+        for path in paths:
+            asm.assemble_file(path).mif()
+
+        in_process_time = time.perf_counter() - start
+
+    print('{0} files: subprocess {1:.3f}s, in-process {2:.3f}s ({3:.1f}x)'.format(count, subprocess_time, in_process_time, subprocess_time / in_process_time))
+
+
+if __name__ == '__main__':
+    main()
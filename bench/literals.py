@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import assembler
+import disassemble
+import generate
+import isa
+import parse
+
+
+def legacy_parse_hex_number(text):
+    # the per-digit parser parse_literal replaced; only correct for uppercase digits
+    c = text[-1]
+    num = 0
+    digit = 0
+
+    while c != 'x':
+        num += (int(c) if c.isdigit() else ord(c) - ord('A') + 10) * (16 ** digit)
+        digit += 1
+        c = text[-1 * digit - 1]
+
+    return num
+
+
+def best_of(parse_all, literals, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_all(literals)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+# immediate as written -> the value the hardware sign-extends it to, or None if rejected;
+# a 32-bit two's-complement word counts as the negative value it stands for
+IMMEDIATES = [
+    (str(isa.IMM_MIN), isa.IMM_MIN),
+    (str(isa.IMM_MAX), isa.IMM_MAX),
+    (str(isa.IMM_MIN - 1), None),
+    (str(isa.IMM_MAX + 1), None),
+    ('0xFFFFE000', isa.IMM_MIN),
+    ('0xFFFFF020', -0xFE0),
+    ('0xFFFFFFFF', -1),
+    ('0xFFFFDFFF', None),
+    ('0x80000000', None),
+    ('0x100000000', None),
+]
+
+
+def assemble_words(source, encoder):
+    return generate.assemble(list(assembler.read_tokens(source)), encoder=encoder).memory.words()
+
+
+def branch_offset(offset, encoder):
+    # -> the offset a branch over offset words encodes to, as the hardware reads it back
+    filler = ['ADD T0,T0,T0'] * abs(offset)
+
+    if offset >= 0:
+        source, index = ['BEQ Zero,Zero,far'] + filler + ['far:', 'ADD T0,T0,T0'], 0
+    else:
+        source, index = ['back:'] + filler[1:] + ['BEQ Zero,Zero,back'], -offset - 1
+
+    words = generate.assemble(list(assembler.read_tokens(source)), 2 * abs(offset) + 2, encoder=encoder).memory.words()
+    return disassemble.decode(words[index])[2]['imm']
+
+
+def check_ranges():
+    # every immediate is sign-extended, so the edges are IMM_MIN and IMM_MAX either way
+    for encoder in sorted(generate.ENCODERS):
+        for offset in (isa.IMM_MIN, isa.IMM_MAX):
+            assert branch_offset(offset, encoder) == offset, offset
+
+        for offset in (isa.IMM_MIN - 1, isa.IMM_MAX + 1):
+            try:
+                branch_offset(offset, encoder)
+                assert False, 'branch offset {0} was accepted'.format(offset)
+            except generate.SemanticException:
+                pass
+
+        for text, expected in IMMEDIATES:
+            try:
+                words = assemble_words(['ADDI T0,Zero,{0}'.format(text)], encoder)
+                assert disassemble.decode(words[0])[2]['imm'] == expected, text
+            except generate.SemanticException:
+                assert expected is None, text
+
+        # a memory-mapped I/O address, the usual way to name one
+        assert assemble_words(['.NAME LEDR=0xFFFFF020', 'SW A1,LEDR(Zero)'], encoder)[0] == 0x68047020
+
+
+def main(count=100000, distinct=2000, repeat=5):
+    # a data-heavy program repeats a modest set of constants many times over
+    literals = ['0x{0:X}'.format((i % distinct) * 2654435761 & 0xFFFFFFFF) for i in range(count)]
+
+    for text in literals[:distinct] + ['0xdeadBEEF', '0X1f']:
+        assert parse.parse_literal(text)[0] == int(text, 16), text
+
+    check_ranges()
+    parse.parse_literal.cache_clear()
+    legacy = best_of(lambda texts: [legacy_parse_hex_number(text) for text in texts], literals, repeat)
+    cached = best_of(lambda texts: [parse.parse_literal(text) for text in texts], literals, repeat)
+    print('{0} hex literals ({1} distinct): per digit {2:.1f}ms, cached int() {3:.1f}ms ({4:.0f}x)'.format(count, distinct, legacy * 1000, cached * 1000, legacy / cached))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import generate
+import image
+import output
+
+
+def legacy_hex_str(num):
+    h = '{0:x}'.format(num)
+
+    for i in range(8 - len(h)):
+        h = '0' + h
+
+    return h
+
+
+def legacy_write(runs, f):
+    # the print-per-line writer and zero-padding loop this module replaced
+    print('WIDTH=32;', file=f)
+    print('DEPTH=16384;', file=f)
+    print('ADDRESS_RADIX=HEX;', file=f)
+    print('DATA_RADIX=HEX;', file=f)
+    print('CONTENT BEGIN', file=f)
+    current = 0
+
+    for start, value, count in runs:
+        if count == 1:
+            print('{0} : {1};'.format(legacy_hex_str(start), legacy_hex_str(value)), file=f)
+        else:
+            print('[{0}..{1}] : {2};'.format(legacy_hex_str(start), legacy_hex_str(start + count - 1), legacy_hex_str(value)), file=f)
+
+        current = start + count
+
+    print('[{0}..{1}] : deaddead;'.format(legacy_hex_str(current), legacy_hex_str(16383)), file=f)
+    print('END;', file=f)
+
+
+def buffered_write(runs, f):
+    output.write_lines(generate.mif_lines(runs), f)
+
+
+def best_of(write, memory, path, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        with open(path, 'w') as f:
+            write(memory.runs(), f)
+
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main(repeat=10):
+    # every word differs from its neighbours, so each one is its own MIF line; the last
+    # address is left to the fill line, which both writers render the same way
+    memory = image.SparseImage.from_items((i, (i * 2654435761) & 0xFFFFFFFF) for i in range(generate.DEPTH - 1))
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, 'legacy.mif')
+        buffered_path = os.path.join(directory, 'buffered.mif')
+        legacy = best_of(legacy_write, memory, legacy_path, repeat)
+        buffered = best_of(buffered_write, memory, buffered_path, repeat)
+
+        with open(legacy_path) as f1, open(buffered_path) as f2:
+            assert f1.read() == f2.read(), 'writers disagree'
+
+    print('{0} words: print per line {1:.1f}ms, buffered {2:.1f}ms ({3:.1f}x)'.format(generate.DEPTH, legacy * 1000, buffered * 1000, legacy / buffered))
+
+
+if __name__ == '__main__':
+    main()
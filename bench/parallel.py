@@ -0,0 +1,60 @@
+import os
+import sys
+import hashlib
+import marshal
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import assembler
+import diagnostics
+import synth
+
+
+def assemble_all(path, options, workers):
+    # -> (seconds, parent CPU seconds, digest of every output line and error), so runs can
+    # be checked against each other; the parent's share bounds what more CPUs can gain
+    digest = hashlib.sha256()
+    start = time.perf_counter()
+    cpu = time.process_time()
+
+    with open(path) as f:
+        try:
+            for line in assembler.assemble_lines(f, 'table', options, path, workers=workers):
+                digest.update(line.encode())
+        except diagnostics.AssemblyException as e:
+            for entry in e.diagnostics:
+                digest.update(marshal.dumps((entry.line_num, entry.column, entry.message, entry.text)))
+
+    return time.perf_counter() - start, time.process_time() - cpu, digest.hexdigest()
+
+
+def main(lines=1000000, counts=(2, 4, 8)):
+    prog = synth.program(lines)
+    options = {'depth': prog.depth()}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'parallel.a32')
+        synth.write_program(path, prog)
+        clean = {}
+
+        for workers in (1,) + counts:
+            clean[workers] = assemble_all(path, options, workers)
+
+        prog.lines[lines // 3] = 'ADD T0,T1' # an error inside a chunk and one on a chunk boundary,
+        prog.lines[assembler.PARSE_CHUNK] = 'BEQ T0' # whose line numbers must survive the merge
+        synth.write_program(path, prog)
+        _, _, expected = assemble_all(path, options, 1)
+        serial, serial_cpu, _ = clean[1]
+        print('{0} lines on {1} CPUs: serial {2:.2f}s'.format(lines, os.cpu_count(), serial))
+
+        for workers in counts:
+            elapsed, cpu, digest = clean[workers]
+            assert digest == clean[1][2], '{0} workers disagree with the serial assembly'.format(workers)
+            assert assemble_all(path, options, workers)[2] == expected, '{0} workers disagree on the errors'.format(workers)
+            print('{0:>3} workers: {1:.2f}s ({2:.2f}x), parent CPU {3:.2f}s ({4:.0%} of serial)'.format(workers, elapsed, serial / elapsed, cpu, cpu / serial_cpu))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import client
+from inprocess import write_programs
+
+# requests the daemon must answer as malformed, rather than fail on or drop
+MALFORMED = [
+    [],
+    {'path': 'x.a32', 'options': []},
+    {'path': 'x.a32', 'format': 'nope'},
+    {'path': 7},
+    {'options': {}},
+    {'text': None},
+    {'text': 'ADD T0,T1,T2', 'path': 7},
+    {'text': 'ADD T0,T1,T2', 'output': 7},
+]
+
+
+def check_malformed(socket_path):
+    for message in MALFORMED:
+        response, data = client.request(message, socket_path)
+        assert response == {'status': 'error', 'message': 'Error: malformed request', 'length': 0} and data == b'', (message, response)
+
+
+def main(count=50):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_programs(directory, count)
+        socket_path = os.path.join(directory, 'asm.sock')
+        environment = dict(os.environ, CS3220_ASM_SOCKET=socket_path)
+        assembler = [sys.executable, os.path.join(ROOT, 'assembler.py'), '--no-cache']
+        server = subprocess.Popen(assembler + ['--serve', '-j', '2'], env=environment, stderr=subprocess.DEVNULL)
+
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+
+            check_malformed(socket_path)
+            start = time.perf_counter()
+
+            for path in paths:
+                subprocess.run(assembler + [path, '-o', path + '.expected'], check=True)
+
+            direct = time.perf_counter() - start
+            start = time.perf_counter()
+
+            for path in paths:
+                subprocess.run([sys.executable, os.path.join(ROOT, 'client.py'), path, path + '.mif'], env=environment, check=True)
+
+            served = time.perf_counter() - start
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+        for path in paths:
+            with open(path + '.expected', 'rb') as f1, open(path + '.mif', 'rb') as f2:
+                assert f1.read() == f2.read(), 'the daemon disagrees on ' + path
+
+    print('{0} files: assembler.py {1:.3f}s, client.py via --serve {2:.3f}s ({3:.1f}x)'.format(count, direct, served, direct / served))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import assembler
+import simulate
+
+
+SOURCE = '''
+    ADDI T1,Zero,8000
+    ADDI A0,Zero,0x400
+outer:
+    ADDI T2,Zero,100
+inner:
+    ADD S0,S0,T2
+    XOR S1,S1,S0
+    LW T3,0(A0)
+    ADD T3,T3,S1
+    SW T3,0(A0)
+    SUBI T2,T2,1
+    BNE T2,Zero,inner
+    ADDI T0,T0,1
+    BLT T0,T1,outer
+done:
+    BR done
+'''
+
+
+def decode_every_step(sim, steps):
+    # the same handlers, decoded afresh for every instruction as an uncached interpreter does
+    pc = sim.pc
+
+    for _ in range(steps):
+        pc = sim.decode(pc)(pc)
+
+    sim.pc = pc
+
+
+def timed(run, steps):
+    sim = simulate.Simulator.from_image(assembler.assemble(SOURCE).memory, assembler.generate.DEPTH)
+    start = time.perf_counter()
+    run(sim, steps)
+    return time.perf_counter() - start, sim
+
+
+def main(steps=2000000):
+    cached, sim1 = timed(simulate.Simulator.run, steps)
+    uncached, sim2 = timed(decode_every_step, steps)
+    assert (sim1.pc, sim1.registers, sim1.memory) == (sim2.pc, sim2.registers, sim2.memory), 'cached and uncached runs disagree'
+    print('{0} instructions: decode every step {1:.2f}M/s, pre-decoded {2:.2f}M/s ({3:.1f}x)'.format(steps, steps / uncached / 1e6, steps / cached / 1e6, uncached / cached))
+
+
+if __name__ == '__main__':
+    main()
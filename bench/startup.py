@@ -0,0 +1,111 @@
+import os
+import sys
+import io
+import compileall
+import subprocess
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# times from interpreter start of the script to the first parsed line
+SCRIPT = '''
+import time
+started = time.perf_counter()
+import assembler
+{0}
+list(assembler.read_tokens(['ADD T0,T1,T2']))
+print(time.perf_counter() - started)
+'''
+
+EAGER = 'import regex; regex.compile_all()' # what every import did before grammars compiled lazily
+PROGRAM = 'ADD T0,T1,T2\n'
+
+
+def first_line_seconds(setup, repeat):
+    times = []
+
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', SCRIPT.format(setup)], cwd=ROOT, stdout=subprocess.PIPE, check=True)
+        times.append(float(result.stdout))
+
+    return sorted(times)[len(times) // 2]
+
+
+def baseline_tree(directory):
+    # extracts the repository's first commit, the assembler before any of this work, or
+    # returns None outside a git checkout
+    try:
+        commit = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, universal_newlines=True).stdout.split()[-1]
+        archive = subprocess.run(['git', 'archive', commit], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+    compileall.compile_dir(directory, quiet=1) # as warm as this tree, or it pays for compiling every run
+
+    return commit[:7], directory
+
+
+def run_seconds(command, repeat):
+    # median wall time of a whole assembler.py run, interpreter start to exit
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+
+    return sorted(times)[len(times) // 2]
+
+
+def compare_baseline(repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'one.a32')
+
+        with open(path, 'w') as f:
+            f.write(PROGRAM)
+
+        baseline = baseline_tree(os.path.join(directory, 'baseline'))
+
+        if baseline is None:
+            print('one-line program: no git history, so no baseline to compare against')
+            return
+
+        commit, tree = baseline
+        # the baseline wrote MIF to stdout, which every version since still does by default
+        before = run_seconds([sys.executable, os.path.join(tree, 'assembler.py'), path], repeat)
+        cached = run_seconds([sys.executable, os.path.join(ROOT, 'assembler.py'), path], repeat)
+        uncached = run_seconds([sys.executable, os.path.join(ROOT, 'assembler.py'), '--no-cache', path], repeat)
+        print('one-line program, whole run: baseline {0} {1:.1f}ms, now {2:.1f}ms with the cache ({3:+.1f}ms), {4:.1f}ms without ({5:+.1f}ms)'.format(commit, before * 1000, cached * 1000, (cached - before) * 1000, uncached * 1000, (uncached - before) * 1000))
+
+
+def import_times(module, top):
+    # the slowest imports by cumulative time, from python -X importtime
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], cwd=ROOT, stderr=subprocess.PIPE, check=True, universal_newlines=True)
+    rows = []
+
+    for line in result.stderr.splitlines()[1:]:
+        own, cumulative, name = line.split('|') # 'import time: self | cumulative | name'
+        rows.append((int(cumulative), int(own.split(':')[1]), name.rstrip()))
+
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(repeat=11, top=15):
+    compileall.compile_dir(ROOT, quiet=1) # stale bytecode would be recompiled on every run timed
+    compare_baseline(repeat)
+    eager = first_line_seconds(EAGER, repeat)
+    lazy = first_line_seconds('', repeat)
+    print('import to first line: eager grammars {0:.1f}ms, lazy {1:.1f}ms ({2:.1f}ms saved)'.format(eager * 1000, lazy * 1000, (eager - lazy) * 1000))
+    print('slowest imports of assembler (us, cumulative / self):')
+
+    for cumulative, own, name in import_times('assembler', top):
+        print('{0:>8} {1:>8}  {2}'.format(cumulative, own, name))
+
+
+if __name__ == '__main__':
+    main()
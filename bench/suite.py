@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import assembler
+import compare
+import profiling
+import synth
+import startup
+
+
+SIZES = (1000, 10000, 100000)
+THRESHOLD = 0.25 # fractional throughput drop that counts as a regression
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Time the assembler on synthetic programs and check against a baseline')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='program sizes in source lines, up to 1000000 (default: {0})'.format(' '.join(map(str, SIZES))))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement; the best is kept (default: 3)')
+    parser.add_argument('--label-density', type=float, default=0.05)
+    parser.add_argument('--gaps', type=int, default=4)
+    parser.add_argument('--save', metavar='PATH', help='write the results as a JSON baseline')
+    parser.add_argument('--check', metavar='PATH', help='compare against a JSON baseline and exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed throughput drop against the baseline (default: {0})'.format(THRESHOLD))
+    return parser.parse_args()
+
+
+def best_of(run, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+
+    return best
+
+
+def throughput(seconds, items):
+    return {'seconds': round(seconds, 6), 'items': items, 'items_per_second': round(items / seconds) if seconds else None}
+
+
+def run_assembler(path, out, depth, *flags):
+    command = [sys.executable, os.path.join(ROOT, 'assembler.py'), '--no-cache', '--depth', str(depth), path, '-o', out]
+    subprocess.run(command + list(flags), check=True)
+
+
+def run_phases(path, out, depth):
+    # in process, so profiling.Stats can split the time between parse.py and generate.py
+    stats = profiling.Stats(trace_memory=False)
+    assembler.main(path, 'table', None, {'depth': depth, 'width': assembler.generate.WIDTH, 'encoder': 'scalar'}, out, 'mif', stats)
+    return stats.report()['phases']
+
+
+def measure(size, directory, args):
+    prog = synth.program(size, label_density=args.label_density, gaps=args.gaps)
+    depth = prog.depth()
+    path = os.path.join(directory, 'synth{0}.a32'.format(size))
+    scalar = os.path.join(directory, 'scalar{0}.mif'.format(size))
+    bulk = os.path.join(directory, 'bulk{0}.mif'.format(size))
+    synth.write_program(path, prog)
+
+    pipeline, _ = best_of(lambda: run_assembler(path, scalar, depth), args.repeat)
+    run_assembler(path, bulk, depth, '--encoder', 'bulk')
+    _, phases = best_of(lambda: run_phases(path, scalar, depth), args.repeat)
+    comparison, (headers, found) = best_of(lambda: compare.compare(scalar, bulk), args.repeat)
+    assert not headers and not found, 'the bulk encoder disagrees with the scalar one on synth{0}.a32'.format(size)
+
+    return {
+        'lines': size,
+        'words': prog.words,
+        'depth': depth,
+        'pipeline': throughput(pipeline, size),
+        'phases': phases,
+        'compare': throughput(comparison, depth),
+    }
+
+
+def measure_startup(directory, args):
+    # a one-line program, so the run is almost all interpreter and import time
+    prog = synth.Program(['ADD T0,T1,T2'], 1)
+    path = os.path.join(directory, 'startup.a32')
+    synth.write_program(path, prog)
+    seconds, _ = best_of(lambda: run_assembler(path, path + '.mif', prog.depth()), args.repeat)
+    return throughput(seconds, 1)
+
+
+def rates(results):
+    # flattens results to {'<size>/<measurement>': items per second}
+    found = {'startup': results.get('startup', {}).get('items_per_second')}
+
+    for size, result in results['sizes'].items():
+        found[size + '/pipeline'] = result['pipeline']['items_per_second']
+        found[size + '/compare'] = result['compare']['items_per_second']
+
+        for name, phase in result['phases'].items():
+            found[size + '/' + name] = phase['items_per_second']
+
+    return {key: rate for key, rate in found.items() if rate}
+
+
+def regressions(baseline, results, threshold=THRESHOLD):
+    current = rates(results)
+
+    for key, expected in sorted(rates(baseline).items()):
+        if key in current and current[key] < expected * (1 - threshold):
+            yield key, expected, current[key]
+
+
+def main(args):
+    results = {'python': platform.python_version(), 'machine': platform.machine(), 'sizes': {}}
+
+    with tempfile.TemporaryDirectory() as directory:
+        results['startup'] = measure_startup(directory, args)
+        slowest = ', '.join('{0} {1:.1f}ms'.format(name.strip(), cumulative / 1000) for cumulative, _, name in startup.import_times('assembler', 6)[1:])
+        print('startup: {0:.1f}ms; slowest imports: {1}'.format(results['startup']['seconds'] * 1000, slowest))
+
+        for size in args.sizes:
+            result = results['sizes'][str(size)] = measure(size, directory, args)
+            phases = ', '.join('{0} {1}/s'.format(name, phase['items_per_second']) for name, phase in result['phases'].items())
+            print('{0} lines: pipeline {1:.3f}s ({2} lines/s), compare {3:.1f}ms; {4}'.format(size, result['pipeline']['seconds'], result['pipeline']['items_per_second'], result['compare']['seconds'] * 1000, phases))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        with open(args.check) as f:
+            found = list(regressions(json.load(f), results, args.threshold))
+
+        for key, expected, rate in found:
+            print('regression: {0} fell from {1} to {2} items/s ({3:.0%})'.format(key, expected, rate, rate / expected - 1), file=sys.stderr)
+
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(parse_args())
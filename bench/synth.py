@@ -0,0 +1,150 @@
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import isa
+
+
+PSEUDO = 'PSEUDO'
+WORD = 'WORD'
+
+# share of instruction lines by instruction class, plus pseudo-instructions and .WORD data
+MIX = {
+    isa.BRANCH: 0.15,
+    isa.LOAD: 0.20,
+    isa.STORE: 0.10,
+    isa.FUNCI: 0.15,
+    isa.FUNCR: 0.25,
+    isa.JUMP: 0.03,
+    PSEUDO: 0.10,
+    WORD: 0.02,
+}
+
+REGISTERS = ['Zero', 'RV', 'RA', 'SP', 'GP', 'FP'] + ['{0}{1}'.format(bank, i) for bank in 'ATS' for i in range(16)]
+NAMES = 16 # .NAME constants defined up front, used as load/store offsets and .WORD data
+BRANCH_REACH = 4096 # words back a branch may reach, well inside the 14-bit offset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Write a synthetic CS3220 program')
+    parser.add_argument('lines', type=int, help='source lines to generate')
+    parser.add_argument('-o', '--output', help='write the program to this file instead of stdout')
+    parser.add_argument('--label-density', type=float, default=0.05, help='chance of a label before each instruction (default: 0.05)')
+    parser.add_argument('--gaps', type=int, default=4, help='.ORIG gaps spread through the program (default: 4)')
+    parser.add_argument('--gap-words', type=int, default=256, help='words skipped by each .ORIG gap (default: 256)')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+class Program(object):
+    # source lines in order, and the memory words they occupy including .ORIG gaps
+    def __init__(self, lines, words):
+        self.lines = lines
+        self.words = words
+
+
+    def depth(self):
+        # the smallest power of two that holds the program, for --depth
+        return 1 << max(self.words - 1, 1).bit_length()
+
+
+def operand(field, rng):
+    if field == 'imm(rs)':
+        return '{0}({1})'.format(offset(rng), rng.choice(REGISTERS))
+
+    return rng.choice(REGISTERS)
+
+
+def offset(rng):
+    return 'c{0}'.format(rng.randrange(NAMES)) if rng.random() < 0.5 else str(4 * rng.randrange(-64, 64))
+
+
+def instruction(inst_class, target, rng):
+    mnemonic = rng.choice(isa.mnemonics(inst_class))
+    fields = isa.FORMATS[inst_class][0]
+
+    if inst_class == isa.BRANCH:
+        operands = [rng.choice(REGISTERS), rng.choice(REGISTERS), target]
+    elif inst_class == isa.FUNCI:
+        operands = [rng.choice(REGISTERS), rng.choice(REGISTERS), str(rng.randrange(-512, 512))]
+    elif inst_class == isa.JUMP: # numeric targets; a label's word index outgrows the immediate
+        operands = [rng.choice(REGISTERS), '{0}({1})'.format(4 * rng.randrange(64), rng.choice(REGISTERS))]
+    else:
+        operands = [operand(field, rng) for field in fields]
+
+    return '{0} {1}'.format(mnemonic, ','.join(operands))
+
+
+def pseudo(target, rng):
+    a, b, c = (rng.choice(REGISTERS) for _ in range(3))
+
+    return rng.choice([
+        'NOT {0},{1}'.format(a, b),
+        'BR {0}'.format(target),
+        'GT {0},{1},{2}'.format(a, b, c),
+        'GE {0},{1},{2}'.format(a, b, c),
+        'SUBI {0},{1},{2}'.format(a, b, rng.randrange(512)),
+        'CALL {0}(Zero)'.format(4 * rng.randrange(64)),
+        'RET',
+    ])
+
+
+def program(lines, mix=MIX, label_density=0.05, gaps=4, gap_words=256, seed=0):
+    # branches only reach back to labels in their own segment and within BRANCH_REACH
+    # words, so every generated program assembles whatever its size
+    rng = random.Random(seed)
+    classes = list(mix)
+    weights = [mix[inst_class] for inst_class in classes]
+    source = ['.NAME c{0}=0x{1:X}'.format(i, 4 * rng.randrange(1024)) for i in range(NAMES)]
+    gap_at = set(len(source) + (i + 1) * lines // (gaps + 1) for i in range(gaps))
+    word = 0
+    labels = [] # (word, name) defined in the current segment, oldest first
+
+    while len(source) < lines:
+        if len(source) in gap_at:
+            word += gap_words
+            source.append('.ORIG 0x{0:X}'.format(word * 4))
+            labels = []
+            continue
+
+        while labels and labels[0][0] < word - BRANCH_REACH:
+            labels.pop(0)
+
+        if not labels or rng.random() < label_density:
+            labels.append((word, 'L{0}'.format(len(source))))
+            source.append(labels[-1][1] + ':')
+            continue
+
+        target = rng.choice(labels)[1]
+        inst_class = rng.choices(classes, weights)[0]
+
+        if inst_class == WORD:
+            source.append('.WORD c{0}'.format(rng.randrange(NAMES)))
+        elif inst_class == PSEUDO:
+            source.append(pseudo(target, rng))
+        else:
+            source.append(instruction(inst_class, target, rng))
+
+        word += 1
+
+    return Program(source, word)
+
+
+def write_program(path, prog):
+    with open(path, 'w') as f:
+        f.write('\n'.join(prog.lines) + '\n')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    prog = program(args.lines, label_density=args.label_density, gaps=args.gaps, gap_words=args.gap_words, seed=args.seed)
+
+    if args.output:
+        write_program(args.output, prog)
+    else:
+        print('\n'.join(prog.lines))
+
+    print('{0} lines, {1} words, --depth {2}'.format(len(prog.lines), prog.words, prog.depth()), file=sys.stderr)
@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+import output
+
+
+DEFAULT_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'cs3220-asm')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.out'
+STATS_FILE = 'stats.json'
+READ_BYTES = 1024 * 1024 # sources are hashed in blocks this size, never read whole
+
+
+class Cache(object):
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+
+    def digest(self, version, options=None):
+        digest = hashlib.sha256()
+        digest.update(version.encode())
+        digest.update(json.dumps(options or {}, sort_keys=True).encode())
+        return digest
+
+
+    def key(self, source, version, options=None):
+        digest = self.digest(version, options)
+        digest.update(source)
+        return digest.hexdigest()
+
+
+    def key_file(self, path, version, options=None):
+        # the same key as key() on the file's bytes
+        digest = self.digest(version, options)
+
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BYTES), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+
+    def open_entry(self, key):
+        # -> the entry opened for binary reading, or None on a miss; an open entry can
+        # still be read if another process evicts it meanwhile
+        path = self.path(key)
+
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        os.utime(path) # entries are evicted least recently used first, by mtime
+        return f
+
+
+    def get(self, key):
+        f = self.open_entry(key)
+
+        if f is None:
+            return None
+
+        with f:
+            return f.read()
+
+
+    def entry_path(self, key):
+        # where to write a new entry, atomically; evict() once it is in place
+        os.makedirs(self.directory, exist_ok=True)
+        return self.path(key)
+
+
+    def put(self, key, data):
+        output.write_atomic(self.entry_path(key), data)
+        self.evict()
+
+
+    def entries(self):
+        entries = []
+
+        for name in os.listdir(self.directory):
+            if name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        return sorted(entries)
+
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+            total -= size
+
+
+    def stats(self):
+        try:
+            with open(os.path.join(self.directory, STATS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0}
+
+
+    def save_stats(self, hits=None, misses=None):
+        hits = self.hits if hits is None else hits
+        misses = self.misses if misses is None else misses
+
+        if not (hits or misses) or not os.path.isdir(self.directory):
+            return
+
+        stats = self.stats()
+        stats['hits'] += hits
+        stats['misses'] += misses
+
+        # written in place rather than atomically, as this happens on every run: a torn
+        # file only resets the counts, which stats() reads as zero
+        with open(os.path.join(self.directory, STATS_FILE), 'w') as f:
+            f.write(json.dumps(stats))
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import socket
+
+
+# kept to the standard library and free of the assembler's own modules, so starting
+# the client costs little more than the interpreter; must match server.SOCKET
+SOCKET = os.environ.get('CS3220_ASM_SOCKET') or os.path.join(os.environ.get('TMPDIR') or '/tmp', 'cs3220-asm-{0}.sock'.format(os.getuid()))
+ASSEMBLER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assembler.py')
+
+
+def usage(message):
+    print('ERROR: {0}'.format(message))
+    print('usage: client.py <sourcefile> <destinationfile>')
+    print('       client.py --stats')
+    sys.exit(1)
+
+
+def request(message, path=SOCKET):
+    with socket.socket(socket.AF_UNIX) as connection:
+        connection.connect(path)
+        connection.sendall(json.dumps(message).encode() + b'\n')
+
+        with connection.makefile('rb') as f:
+            response = json.loads(f.readline())
+            return response, f.read(response.get('length', 0))
+
+
+def main(argv):
+    if argv == ['--stats']:
+        response, _ = request({'command': 'stats'})
+        print(json.dumps(response, indent=2))
+        return 0
+
+    if len(argv) != 2:
+        usage('must supply source and destination files')
+
+    if not os.path.isfile(argv[0]):
+        usage('source file does not exist')
+
+    try:
+        response, _ = request({'path': os.path.abspath(argv[0]), 'output': os.path.abspath(argv[1])})
+    except (FileNotFoundError, ConnectionRefusedError): # no server; assemble as run.sh does
+        os.execv(sys.executable, [sys.executable, ASSEMBLER, argv[0], '-o', argv[1]])
+
+    if response['status'] != 'ok':
+        print(response['message'], file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,67 +1,113 @@
 import sys
-import re
-import parse
+import mif
 
 
-m1 = sys.argv[1]
-m2 = sys.argv[2]
+def contiguous(segments):
+    address = 0
 
+    for start, end, value in segments:
+        if start > address: # unlisted addresses have no value
+            yield address, start - 1, None
 
-def get_lines(f):
-    return [line.strip() for line in f.readlines() if line.strip()[0] == '[' or re.match('\d', line.strip()[0])]
+        yield start, end, value
+        address = end + 1
 
+    yield address, None, None # open ended, past the last listed address
 
-def split_line(line):
-    return [part.strip().strip(';') for part in re.split('\s+:\s+', line)]
 
+def diff_segments(segments1, segments2):
+    segments1, segments2 = contiguous(segments1), contiguous(segments2)
+    start1, end1, value1 = next(segments1)
+    start2, end2, value2 = next(segments2)
+    address = 0
 
-def get_hex(value):
-    value = '0x' + value.upper()
-    return parse.parse_hex_number(value)
+    while end1 is not None or end2 is not None:
+        end = end2 if end1 is None else end1 if end2 is None else min(end1, end2)
 
+        if value1 != value2:
+            yield address, end, value1, value2
 
-def produce_range(line):
-    values = []
-    split = split_line(line)
-    range_values = split[0].strip('[]').split('..')
-    range_values = [get_hex(value) for value in range_values]
-    value = split[1].upper()
+        address = end + 1
 
-    for i in range(range_values[1] - range_values[0] + 1):
-        values.append(value)
+        if end1 == end:
+            start1, end1, value1 = next(segments1)
 
-    return values
+        if end2 == end:
+            start2, end2, value2 = next(segments2)
 
 
-def produce_values(lines):
-    values = []
+def conflicts(segments1, segments2):
+    # adjacent differences are merged while they have the same pair of values, or
+    # while both are length mismatches on the same side
+    current = None
 
-    for line in lines:
-        if re.match('^\[\w+\.\.\w+\]\s+:\s+\w+;$', line):
-            values = values + produce_range(line)
+    for start, end, value1, value2 in diff_segments(segments1, segments2):
+        if value1 is None or value2 is None:
+            key = (value1 is None, value2 is None)
         else:
-            value = split_line(line)[1]
-            value = value.upper()
-            values.append(value)
+            key = (value1, value2)
 
-    return values
+        if current and current[1] + 1 == start and current[2] == key:
+            current[1] = end
+        else:
+            if current:
+                yield tuple(current)
+
+            current = [start, end, key, value1, value2]
+
+    if current:
+        yield tuple(current)
+
+
+def address_range(start, end):
+    if start == end:
+        return 'address {0:08x}'.format(start)
+
+    return 'addresses [{0:08x}..{1:08x}]'.format(start, end)
+
+
+def describe_conflict(start, end, key, value1, value2):
+    if value1 is None:
+        return 'length mismatch at {0}: only file 2 has values'.format(address_range(start, end))
+    elif value2 is None:
+        return 'length mismatch at {0}: only file 1 has values'.format(address_range(start, end))
+    else:
+        return 'conflict at {0}, file 1 had {1:08x} and file 2 had {2:08x}'.format(address_range(start, end), value1, value2)
+
+
+def header_conflicts(mif1, mif2):
+    found = []
+
+    for setting in ('width', 'depth'):
+        value1, value2 = getattr(mif1, setting), getattr(mif2, setting)
+
+        if value1 != value2:
+            found.append('{0} mismatch: file 1 has {0}={1} and file 2 has {0}={2}'.format(setting.upper(), value1, value2))
+
+    return found
+
+
+def compare(path1, path2):
+    with open(path1) as f1, open(path2) as f2:
+        mif1, mif2 = mif.MifReader(f1), mif.MifReader(f2)
+        return header_conflicts(mif1, mif2), list(conflicts(mif1, mif2))
 
 
-def main():
-    with open(m1, 'r') as f:
-        m1_lines = get_lines(f)
+def main(path1, path2):
+    try:
+        headers, found = compare(path1, path2)
+    except mif.MifException as e:
+        print('Error: {0}'.format(str(e)), file=sys.stderr)
+        return 2
 
-    with open(m2, 'r') as f:
-        m2_lines = get_lines(f)
+    for header in headers:
+        print(header)
 
-    m1_values = produce_values(m1_lines)
-    m2_values = produce_values(m2_lines)
+    for conflict in found:
+        print(describe_conflict(*conflict))
 
-    for i in range(len(m1_values)):
-        if m1_values[i] != m2_values[i]:
-            print('conflict at instruction {0}, file 1 had {1} and file 2 had {2}'.format(i, m1_values[i], m2_values[i]))
-            return
+    return 1 if headers or found else 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main(sys.argv[1], sys.argv[2]))
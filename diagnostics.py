@@ -0,0 +1,79 @@
+ERROR = 'error'
+
+
+class Diagnostic(object):
+    __slots__ = ('line_num', 'column', 'severity', 'message', 'text', 'offset')
+
+    def __init__(self, line_num, message, text=None, offset=0, severity=ERROR):
+        self.line_num = line_num
+        self.column = None # 1-based, filled in by Diagnostics.locate from the source line
+        self.severity = severity
+        self.message = message
+        self.text = text # the sanitized statement
+        self.offset = offset # of the offending operand within text
+
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in ('line_num', 'column', 'severity', 'message', 'text')}
+
+
+class AssemblyException(Exception):
+    def __init__(self, diagnostics):
+        super().__init__('{0} error(s)'.format(len(diagnostics)))
+        self.diagnostics = diagnostics
+
+
+class Diagnostics(object):
+    # collects every error from parsing and both passes, so one run reports them all
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = []
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def __iter__(self):
+        return iter(self.entries)
+
+
+    def error(self, line_num, message, text=None, offset=0):
+        self.entries.append(Diagnostic(line_num, message, text, offset))
+
+
+    def locate(self, lines=None):
+        # columns need the raw source line, which tokens do not keep, so they are looked up
+        # again once errors are known; that is one read of the file, on the error path only
+        pending = {}
+
+        for entry in self.entries:
+            pending.setdefault(entry.line_num, []).append(entry)
+
+        if lines is None and self.path:
+            with open(self.path) as f:
+                return self.locate(f)
+
+        for line_num, line in enumerate(lines or (), 1):
+            for entry in pending.get(line_num, ()):
+                start = line.find(entry.text) if entry.text else -1
+                entry.column = (start if start >= 0 else len(line) - len(line.lstrip())) + entry.offset + 1
+
+
+    def check(self):
+        if self.entries:
+            self.entries.sort(key=lambda entry: entry.line_num or 0)
+            self.locate()
+            raise AssemblyException(self)
+
+
+    def lines(self):
+        for entry in self.entries:
+            location = ':'.join(str(part) for part in (self.path, entry.line_num, entry.column) if part is not None)
+            yield '{0}: {1}: {2}'.format(location, entry.severity, entry.message)
+
+
+    def json(self):
+        import json # only JSON error reports need it
+
+        return json.dumps({'file': self.path, 'errors': [entry.to_dict() for entry in self.entries]}, indent=2)
@@ -0,0 +1,166 @@
+import sys
+import argparse
+import isa
+import parse
+import image
+import output
+import mif
+
+
+# (primary opcode, secondary opcode) -> mnemonic; the secondary opcode is 0 outside FUNCR
+DECODE = {(primary_opcode, secondary_opcode): mnemonic for mnemonic, (_, primary_opcode, secondary_opcode) in isa.INSTRUCTIONS.items()}
+
+# register number -> name
+REGISTER_NAMES = {number: 'Zero' if name == 'ZERO' else name for name, (number, _) in parse.REGISTERS.items()}
+
+FIELD_MASK = 0B111111
+SECONDARY_MASK = 0B11111111
+IMM_SIGN = (isa.IMM_MASK + 1) >> 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Disassemble a MIF image back into CS3220 source')
+    parser.add_argument('mif_file', help='path to a MIF image')
+    parser.add_argument('-o', '--output', help='write the source to this file instead of stdout')
+    return parser.parse_args()
+
+
+def sign_extend(imm):
+    return imm - (isa.IMM_MASK + 1) if imm & IMM_SIGN else imm
+
+
+def decode(word):
+    # -> (mnemonic, instruction class, {field: value}), or None if the word is not an instruction
+    primary_opcode = word >> isa.OPCODE_SHIFT
+    secondary_opcode = word & SECONDARY_MASK if primary_opcode == 0 else 0
+    mnemonic = DECODE.get((primary_opcode, secondary_opcode))
+
+    if mnemonic is None:
+        return None
+
+    fields = {
+        'rs': (word >> isa.RS_SHIFT) & FIELD_MASK,
+        'rt': (word >> isa.RT_SHIFT) & FIELD_MASK,
+        'rd': (word >> isa.RD_SHIFT) & FIELD_MASK,
+        'imm': sign_extend(word & isa.IMM_MASK),
+    }
+
+    return mnemonic, isa.INSTRUCTIONS[mnemonic][0], fields
+
+
+def branch_target(decoded, address):
+    return address + 1 + decoded[2]['imm'] # PC = PC + 4 + (imm * 4)
+
+
+def representable(decoded, start, end, depth):
+    # every register field needs a name, and branches need a label target inside memory
+    if decoded is None:
+        return False
+
+    mnemonic, inst_class, fields = decoded
+
+    for field in isa.FORMATS[inst_class][0]:
+        if field != 'imm' and fields['rs' if field == 'imm(rs)' else field] not in REGISTER_NAMES:
+            return False
+
+    if inst_class == isa.BRANCH: # targets move with the address, so the ends bound them
+        return 0 <= branch_target(decoded, start) and branch_target(decoded, end) < depth
+
+    return True
+
+
+def label_name(address):
+    return 'L_{0:X}'.format(address)
+
+
+def format_instruction(decoded, address):
+    mnemonic, inst_class, fields = decoded
+    operands = []
+
+    for field in isa.FORMATS[inst_class][0]:
+        if field == 'imm(rs)':
+            operands.append('{0}({1})'.format(fields['imm'], REGISTER_NAMES[fields['rs']]))
+        elif field == 'imm' and inst_class == isa.BRANCH:
+            operands.append(label_name(branch_target(decoded, address)))
+        elif field == 'imm':
+            operands.append(str(fields['imm']))
+        else:
+            operands.append(REGISTER_NAMES[fields[field]])
+
+    return '{0} {1}'.format(mnemonic, ','.join(operands))
+
+
+def branch_targets(segments, depth):
+    targets = set()
+
+    for start, end, value in segments:
+        decoded = decode(value)
+
+        if representable(decoded, start, end, depth) and decoded[1] == isa.BRANCH:
+            targets.update(branch_target(decoded, address) for address in range(start, end + 1))
+
+    return sorted(targets)
+
+
+def disassemble(segments, depth, targets, fill=image.FILL):
+    index = 0 # the word the emitted source will write next
+    pending = 0 # the first target not yet labelled
+    names = set()
+
+    def advance(address):
+        # labels every target before address, moving the origin through gaps to reach them
+        nonlocal index, pending
+
+        while pending < len(targets) and targets[pending] <= address:
+            if targets[pending] > index:
+                yield '.ORIG 0x{0:X}'.format(targets[pending] * 4)
+                index = targets[pending]
+
+            yield label_name(targets[pending]) + ':'
+            pending += 1
+
+    for start, end, value in segments:
+        if value == fill: # unwritten memory, left to the image fill
+            continue
+
+        decoded = decode(value)
+
+        if not representable(decoded, start, end, depth):
+            decoded = None
+            name = 'W_{0:X}'.format(value)
+
+            if name not in names:
+                names.add(name)
+                yield '.NAME {0}=0x{1:X}'.format(name, value)
+
+        for address in range(start, end + 1):
+            yield from advance(address)
+
+            if address > index:
+                yield '.ORIG 0x{0:X}'.format(address * 4)
+                index = address
+
+            yield format_instruction(decoded, address) if decoded else '.WORD {0}'.format(name)
+            index += 1
+
+    yield from advance(depth)
+
+
+def main(mif_file, output_file=None):
+    with open(mif_file) as f:
+        reader = mif.MifReader(f)
+        targets = branch_targets(reader, reader.depth)
+
+    with open(mif_file) as f: # read again, so the image is streamed rather than held
+        reader = mif.MifReader(f)
+        output.write_output(disassemble(reader, reader.depth, targets), output_file, sys.stdout)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    try:
+        main(args.mif_file, args.output)
+    except mif.MifException as e:
+        print('Error: {0}'.format(str(e)), file=sys.stderr)
+        sys.exit(1)
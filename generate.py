@@ -1,244 +1,596 @@
+import sys
+import array
+import functools
 import parse
+import isa
+import image
+import output
+import profiling
 
 
-labels = {}
-names = {}
+DEPTH = 16384
+WIDTH = 32
 
 
 class UndefinedSymbolException(Exception):
-    def __init__(self, token, message='Undefined symbol'):
+    def __init__(self, token, message='Undefined symbol', operand=None):
         super().__init__(message)
         self.token = token
+        self.operand = operand
 
 
 class SemanticException(Exception):
-    def __init__(self, token, message='Semantic error'):
+    def __init__(self, token, message='Semantic error', operand=None):
         super().__init__(message)
         self.token = token
+        self.operand = operand
 
 
-def lookup_label(line_token, label):
-    if not labels.get(label):
-        raise UndefinedSymbolException(line_token, 'Undefined label: \'{0}\''.format(label))
+def report(diagnostics, e):
+    # raises as before without a collector, otherwise records e and lets the pass carry on
+    if diagnostics is None:
+        raise e
 
-    return labels.get(label)
+    text = e.token.text
+    offset = operand_offset(e.token, str(e.operand)) if text and e.operand is not None else 0
+    diagnostics.error(e.token.line_num, str(e), text, offset)
 
 
-def lookup_name(line_token, name):
-    if not names.get(name):
-        raise UndefinedSymbolException(line_token, 'Undefined name: \'{0}\''.format(name))
+def is_word_char(c):
+    return c.isalnum() or c == '_'
 
-    return names.get(name)
+
+def operand_offset(token, operand):
+    # where operand starts in the statement text, or 0 if it cannot be found; only whole
+    # words after the mnemonic or directive count, so T is not found in T0, nor a label
+    # named ADD in the mnemonic
+    text = token.text
+    i = text.find(operand, 0 if token.is_type(parse.LABEL_DEF) else len(text.split(None, 1)[0]))
+
+    while i >= 0:
+        end = i + len(operand)
+
+        if (i == 0 or not is_word_char(text[i - 1])) and (end == len(text) or not is_word_char(text[end])):
+            return i
+
+        i = text.find(operand, i + 1)
+
+    return 0
+
+
+LABEL = 'label'
+NAME = 'name'
+
+
+class Symbol(object):
+    __slots__ = ('name', 'kind', 'value', 'line_num', 'references')
+
+    def __init__(self, name, kind, value, line_num=None):
+        self.name = name
+        self.kind = kind
+        self.value = value # byte address for labels, the constant for names
+        self.line_num = line_num
+        self.references = [] # line numbers of the statements that use it
+
+
+class Symbols(object):
+    def __init__(self):
+        self.table = {}
+
+
+    def __iter__(self):
+        return iter(self.table.values())
+
+
+    def __len__(self):
+        return len(self.table)
+
+
+    def get(self, name):
+        return self.table.get(name)
+
+
+    def define(self, token, name, kind, value):
+        symbol = self.table.get(name)
+
+        if symbol is not None:
+            raise SemanticException(token, 'Duplicate definition of \'{0}\', first defined at line {1}'.format(name, symbol.line_num), name)
+
+        self.table[name] = Symbol(name, kind, value, token.line_num)
+
+
+    def values(self, kind):
+        return {symbol.name: symbol.value for symbol in self.table.values() if symbol.kind == kind}
+
+
+    @property
+    def labels(self):
+        return self.values(LABEL)
+
+
+    @property
+    def names(self):
+        return self.values(NAME)
+
+
+def lookup_label(symbols, line_token, label):
+    symbol = symbols.get(label)
+
+    if symbol is None or symbol.kind != LABEL:
+        raise UndefinedSymbolException(line_token, 'Undefined label: \'{0}\''.format(label), label)
+
+    return symbol.value
+
+
+def lookup_name(symbols, line_token, name):
+    symbol = symbols.get(name)
+
+    if symbol is None or symbol.kind != NAME:
+        raise UndefinedSymbolException(line_token, 'Undefined name: \'{0}\''.format(name), name)
+
+    return symbol.value
+
+
+# op token kind -> (instruction class, primary opcode, secondary opcode)
+OPCODES = {parse.OPS[mnemonic].flag: entry for mnemonic, entry in isa.INSTRUCTIONS.items()}
 
 
 def get_primary_opcode(op_token):
-    if op_token.is_type(parse.OP_JAL):
-        return 0B001100
-    elif op_token.is_type(parse.OP_BEQ):
-        return 0B001000
-    elif op_token.is_type(parse.OP_BLT):
-        return 0B001001
-    elif op_token.is_type(parse.OP_BLE):
-        return 0B001010
-    elif op_token.is_type(parse.OP_BNE):
-        return 0B001011
-    elif op_token.is_type(parse.OP_LB):
-        return 0B010000
-    elif op_token.is_type(parse.OP_LH):
-        return 0B010001
-    elif op_token.is_type(parse.OP_LW):
-        return 0B010010
-    elif op_token.is_type(parse.OP_LD):
-        return 0B010011
-    elif op_token.is_type(parse.OP_LBU):
-        return 0B010100
-    elif op_token.is_type(parse.OP_LHU):
-        return 0B010101
-    elif op_token.is_type(parse.OP_LWU):
-        return 0B010110
-    elif op_token.is_type(parse.OP_SB):
-        return 0B011000
-    elif op_token.is_type(parse.OP_SH):
-        return 0B011001
-    elif op_token.is_type(parse.OP_SW):
-        return 0B011010
-    elif op_token.is_type(parse.OP_SD):
-        return 0B011011
-    elif op_token.is_type(parse.OP_ADDI):
-        return 0B100000
-    elif op_token.is_type(parse.OP_ANDI):
-        return 0B100100
-    elif op_token.is_type(parse.OP_ORI):
-        return 0B100101
-    elif op_token.is_type(parse.OP_XORI):
-        return 0B100110
-    else:
+    entry = OPCODES.get(op_token.kind)
+
+    if entry is None or entry[0] == isa.FUNCR:
         raise Exception('Unrecognized primary opcode')
 
+    return entry[1]
+
 
 def get_secondary_opcode(op_token):
-    if op_token.is_type(parse.OP_EQ):
-        return 0B00001000
-    elif op_token.is_type(parse.OP_LT):
-        return 0B00001001
-    elif op_token.is_type(parse.OP_LE):
-        return 0B00001010
-    elif op_token.is_type(parse.OP_NE):
-        return 0B00001011
-    elif op_token.is_type(parse.OP_ADD):
-        return 0B00100000
-    elif op_token.is_type(parse.OP_AND):
-        return 0B00100100
-    elif op_token.is_type(parse.OP_OR):
-        return 0B00100101
-    elif op_token.is_type(parse.OP_XOR):
-        return 0B00100110
-    elif op_token.is_type(parse.OP_SUB):
-        return 0B00101000
-    elif op_token.is_type(parse.OP_NAND):
-        return 0B00101100
-    elif op_token.is_type(parse.OP_NOR):
-        return 0B00101101
-    elif op_token.is_type(parse.OP_NXOR):
-        return 0B00101110
-    else:
+    entry = OPCODES.get(op_token.kind)
+
+    if entry is None or entry[0] != isa.FUNCR:
         raise Exception('Unrecognized secondary opcode')
 
+    return entry[2]
+
+
+def resolve_pc_relative(symbols, token, imm_token, index):
+    if imm_token.is_type(parse.IDENTIFIER):
+        return int(lookup_label(symbols, token, imm_token.value) / 4) - index - 1 # PC = PC + 4 + (imm * 4)
+    else:
+        raise SemanticException(token, 'Expecting label, got \'{0}\''.format(imm_token.value), imm_token.value)
+
+
+def resolve_name_or_number(symbols, token, imm_token, index):
+    if imm_token.is_type(parse.IDENTIFIER):
+        return lookup_name(symbols, token, imm_token.value)
+    elif imm_token.is_type(parse.NUMBER):
+        return imm_token.value
+    else:
+        raise SemanticException(token, 'Expecting name or number, got \'{0}\''.format(imm_token.value), imm_token.value)
+
+
+def resolve_label_or_number(symbols, token, imm_token, index):
+    if imm_token.is_type(parse.IDENTIFIER):
+        return int(lookup_label(symbols, token, imm_token.value) / 4) # PC = rs + (imm * 4)
+    elif imm_token.is_type(parse.NUMBER):
+        return imm_token.value
+    else:
+        raise SemanticException(token, 'Expecting label or number, got \'{0}\''.format(imm_token.value), imm_token.value)
+
+
+def resolve_symbol_or_number(symbols, token, imm_token, index):
+    if imm_token.is_type(parse.IDENTIFIER):
+        symbol = symbols.get(imm_token.value) # a label is its actual memory address for LW and FUNCI
+
+        if symbol is None:
+            raise UndefinedSymbolException(token, 'Undefined symbol: \'{0}\''.format(imm_token.value), imm_token.value)
+
+        return symbol.value
+    elif imm_token.is_type(parse.NUMBER):
+        return imm_token.value
+    else:
+        raise SemanticException(token, 'Expecting, name, label, or number, got \'{0}\''.format(imm_token.value), imm_token.value)
+
+
+IMMEDIATES = {
+    isa.PC_RELATIVE: resolve_pc_relative,
+    isa.NAME_OR_NUMBER: resolve_name_or_number,
+    isa.LABEL_OR_NUMBER: resolve_label_or_number,
+    isa.SYMBOL_OR_NUMBER: resolve_symbol_or_number,
+}
+
+
+# op token kind -> (base word, operand layout, immediate resolver), where the
+# layout holds a shift for each register operand, or the name of an immediate field
+ENCODINGS = {}
+
+for mnemonic, (inst_class, primary_opcode, secondary_opcode) in isa.INSTRUCTIONS.items():
+    fields, imm_kind = isa.FORMATS[inst_class]
+    layout = tuple(isa.SHIFTS.get(field, field) for field in fields)
+    base = isa.encode(primary_opcode, secondary_opcode, 0, 0, 0, 0)
+    ENCODINGS[parse.OPS[mnemonic].flag] = (base, layout, IMMEDIATES.get(imm_kind))
+
 
-def first_pass(tokens):
+def operand_source(token, position):
+    # the text of the position-th operand (1-based) as written in the statement, so a hex
+    # literal is located by its digits rather than its decimal value; None without text
+    if not token.text:
+        return None
+
+    fields = token.text.split(None, 1)[1].split(',')
+    return fields[position - 1].split('(')[0].strip() if position <= len(fields) else None
+
+
+def fit_immediate(token, value, position):
+    signed = value - (1 << isa.WORD_BITS) if value >> (isa.WORD_BITS - 1) == 1 else value
+
+    if signed < isa.IMM_MIN or signed > isa.IMM_MAX:
+        raise SemanticException(token, 'Immediate {0} does not fit in {1} bits'.format(value, isa.IMM_MASK.bit_length()), operand_source(token, position))
+
+    return signed & isa.IMM_MASK
+
+
+def encode_instruction(symbols, token, index):
+    operands = token.tokens
+    entry = ENCODINGS.get(operands[0].kind)
+
+    if entry is None:
+        raise Exception('Unrecognized instruction type')
+
+    inst, layout, resolve = entry
+
+    for position, (field, operand) in enumerate(zip(layout, operands[1:]), 1):
+        if field == 'imm':
+            inst |= fit_immediate(token, resolve(symbols, token, operand, index), position)
+        elif field == 'imm(rs)':
+            inst |= fit_immediate(token, resolve(symbols, token, operand.tokens[0], index), position) | (operand.tokens[1].value << isa.RS_SHIFT)
+        else:
+            inst |= operand.value << field
+
+    return inst
+
+
+def orig_index(index, address):
+    return index + max(0, int((address - index * 4) / 4)) # skipped words are left to the image fill
+
+
+def first_pass(tokens, symbols, depth=DEPTH, diagnostics=None):
+    # -> the number of statements read, for profiling.Stats
+    statements = 0
     current_index = 0
+    word_index = 0 # the word second_pass will write next
+    references = {} # symbol name -> referencing lines, which may come before the definition
+    overflowed = False # reported once, rather than for every word past the end
 
     for token in tokens:
-        if token.is_type(parse.LABEL_DEF):
-            labels[token.value] = current_index
-        elif token.is_type(parse.DIR_NAME):
-            names[token.tokens[0].value] = token.tokens[1].value
+        statements += 1
+
+        try:
+            if token.is_type(parse.LABEL_DEF):
+                symbols.define(token, token.value, LABEL, current_index)
+            elif token.is_type(parse.DIR_NAME):
+                symbols.define(token, token.tokens[0].value, NAME, token.tokens[1].value)
+            elif token.is_type(parse.DIR_ORIG):
+                current_index = token.value
+
+                if token.value < current_index:
+                    raise SemanticException(token, 'Cannot set ORIG to a previous location')
+
+                if int(token.value / 4) > depth:
+                    raise SemanticException(token, 'Cannot set ORIG beyond the end of memory (depth {0})'.format(depth))
+
+                word_index = orig_index(word_index, token.value)
+            else:
+                for name in symbol_references(token) if token.is_type(parse.INST) else (token.value,):
+                    references.setdefault(name, []).append(token.line_num)
+
+                current_index += 4
+                word_index += 1
+
+                if word_index > depth and not overflowed:
+                    overflowed = True
+                    raise SemanticException(token, 'Program does not fit in memory (depth {0})'.format(depth))
+        except SemanticException as e:
+            report(diagnostics, e)
+
+    for name, lines in references.items():
+        symbol = symbols.get(name)
+
+        if symbol is not None: # undefined symbols are reported when pass 2 resolves them
+            symbol.references = lines
+
+    return statements
+
+
+def symbol_references(token):
+    references = []
+
+    for operand in token.tokens[1:]:
+        if operand.kind & parse.IMM_REG.flag:
+            operand = operand.tokens[0]
+
+        if operand.kind & parse.IDENTIFIER.flag:
+            references.append(operand.value)
+
+    return references
+
+
+def uses_symbols(token):
+    return len(symbol_references(token)) > 0
+
+
+def is_pc_relative(token):
+    entry = OPCODES.get(token.tokens[0].kind)
+    return entry is not None and isa.FORMATS[entry[0]][1] == isa.PC_RELATIVE
+
+
+def compact(token):
+    if token.is_type(parse.INST) and not uses_symbols(token):
+        try:
+            return encode_instruction(None, token, None)
+        except SemanticException:
+            return token # left for pass 2 to report
+    elif token.is_type(parse.LABEL_DEF) or token.is_type(parse.DIR_NAME):
+        return None
+    else:
+        return token
+
+
+def encode_tokens(tokens, symbols, encode=encode_instruction, width=WIDTH, diagnostics=None):
+    index = 0
+
+    for token in tokens:
+        if type(token) == int: # already encoded by compact
+            yield index, token
+            index += 1
+            continue
         elif token.is_type(parse.DIR_ORIG):
-            current_index = token.value
+            index = orig_index(index, token.value)
+            continue
+        elif not token.is_type(parse.DIR_WORD) and not token.is_type(parse.INST):
+            continue
 
-            if token.value < current_index:
-                raise SemanticException(token, 'Cannot set ORIG to a previous location')
+        try:
+            if token.is_type(parse.DIR_WORD):
+                word = lookup_name(symbols, token, token.value)
+
+                if word < 0 or word >> width:
+                    raise SemanticException(token, 'Value {0} does not fit in a {1}-bit word'.format(word, width))
+            else:
+                word = encode(symbols, token, index)
+        except (UndefinedSymbolException, SemanticException) as e:
+            report(diagnostics, e) # the word is skipped, so later addresses stay put
         else:
-            current_index += 4
+            yield index, word
+
+        index += 1
 
+    if diagnostics is not None:
+        diagnostics.check()
 
-def second_pass(tokens):
-    instructions = []
+
+def word_lines(tokens):
+    # (word index, source line) for each token that produces a word, placed as encode_tokens places it
+    index = 0
 
     for token in tokens:
         if token.is_type(parse.DIR_ORIG):
-            for i in range(int((token.value - len(instructions) * 4) / 4)): # each 0xDEADDEAD adds 4 bytes
-                instructions.append(0xDEADDEAD)
-        elif token.is_type(parse.DIR_WORD):
-            instructions.append(lookup_name(token, token.value))
-        elif token.is_type(parse.INST):
-            op_token = token.tokens[0]
-
-            if token.is_type(parse.INST_FUNCR):
-                secondary_opcode = get_secondary_opcode(token.tokens[0])
-                regno_d = token.tokens[1].value
-                regno_s = token.tokens[2].value
-                regno_t = token.tokens[3].value
-                inst = 0 | (regno_s << 20) | (regno_t << 14) | (regno_d << 8) | secondary_opcode
-            else:
-                primary_opcode = get_primary_opcode(op_token)
-
-                if token.is_type(parse.INST_STORE) or token.is_type(parse.INST_LOAD) or token.is_type(parse.INST_JUMP):
-                    regno_t = token.tokens[1].value
-                    regno_s = token.tokens[2].tokens[1].value
-                    imm_token = token.tokens[2].tokens[0]
-                elif token.is_type(parse.INST_FUNCI):
-                    regno_t = token.tokens[1].value
-                    regno_s = token.tokens[2].value
-                    imm_token = token.tokens[3]
-                elif token.is_type(parse.INST_BRANCH):
-                    regno_t = token.tokens[2].value
-                    regno_s = token.tokens[1].value
-                    imm_token = token.tokens[3]
-                else:
-                    raise Exception('Unrecognized instruction type')
-
-                if token.is_type(parse.INST_BRANCH):
-                    if imm_token.is_type(parse.IDENTIFIER):
-                        imm = int(lookup_label(token, imm_token.value) / 4) - len(instructions) - 1 # PC = PC + 4 + (imm * 4)
-                    else:
-                        raise SemanticException(token, 'Expecting label, got \'{0}\''.format(imm_token.value))
-                elif token.is_type(parse.INST_STORE):
-                    if imm_token.is_type(parse.IDENTIFIER):
-                        imm = lookup_name(token, imm_token.value)
-                    elif imm_token.is_type(parse.NUMBER):
-                        imm = imm_token.value
-                    else:
-                        raise SemanticException(token, 'Expecting name or number, got \'{0}\''.format(imm_token.value))
-                elif token.is_type(parse.INST_JUMP):
-                    if imm_token.is_type(parse.IDENTIFIER):
-                        imm = int(lookup_label(token, imm_token.value) / 4) # PC = rs + (imm * 4)
-                    elif imm_token.is_type(parse.NUMBER):
-                        imm = imm_token.value
-                    else:
-                        raise SemanticException(token, 'Expecting label or number, got \'{0}\''.format(imm_token.value))
-                else:
-                    if imm_token.is_type(parse.IDENTIFIER):
-                        if labels.get(imm_token.value):
-                            imm = labels.get(imm_token.value) # Get actual memory address for LW and FUNCI
-                        elif names.get(imm_token.value):
-                            imm = names.get(imm_token.value)
-                        else:
-                            raise UndefinedSymbolException(token, imm_token.value)
-                    elif imm_token.is_type(parse.NUMBER):
-                        imm = imm_token.value
-                    else:
-                        raise SemainticException(token, 'Expecting, name, label, or number, got \'{0}\''.format(imm_token.value))
-
-                inst = 0 | (primary_opcode << 26) | (regno_s << 20) | (regno_t << 14) | (imm & 0B00000000000000000011111111111111)
-
-            instructions.append(inst)
-
-    return instructions
-
-
-def create_groups(values):
-    current = values[0]
-    groups = [[current]]
-
-    for value in values[1:]:
-        if value == current:
-            groups[-1].append(value)
+            index = orig_index(index, token.value)
+        elif token.is_type(parse.DIR_WORD) or token.is_type(parse.INST):
+            yield index, token.line_num
+            index += 1
+
+
+def second_pass(tokens, symbols, width=WIDTH, diagnostics=None):
+    return image.SparseImage.from_items(encode_tokens(tokens, symbols, width=width, diagnostics=diagnostics))
+
+
+# bulk encoder rows are (base word, rs, rt, rd, imm); register shift -> column
+COLUMNS = {isa.RS_SHIFT: 1, isa.RT_SHIFT: 2, isa.RD_SHIFT: 3}
+IMM_COLUMN = 4
+ROW = 5
+
+# op token kind -> (base word, column for each operand, immediate resolver)
+GATHER = {kind: (base, tuple(COLUMNS.get(field, field) for field in layout), resolve) for kind, (base, layout, resolve) in ENCODINGS.items()}
+
+
+def gather_row(symbols, token, index, width=WIDTH):
+    if token.is_type(parse.DIR_WORD):
+        word = lookup_name(symbols, token, token.value)
+
+        if word < 0 or word >> width:
+            raise SemanticException(token, 'Value {0} does not fit in a {1}-bit word'.format(word, width))
+
+        return word, 0, 0, 0, 0
+
+    operands = token.tokens
+    entry = GATHER.get(operands[0].kind)
+
+    if entry is None:
+        raise Exception('Unrecognized instruction type')
+
+    base, layout, resolve = entry
+    row = [base, 0, 0, 0, 0]
+
+    for position, (column, operand) in enumerate(zip(layout, operands[1:]), 1):
+        if column == 'imm':
+            row[IMM_COLUMN] = fit_immediate(token, resolve(symbols, token, operand, index), position)
+        elif column == 'imm(rs)':
+            row[IMM_COLUMN] = fit_immediate(token, resolve(symbols, token, operand.tokens[0], index), position)
+            row[COLUMNS[isa.RS_SHIFT]] = operand.tokens[1].value
         else:
-            current = value
-            groups.append([value])
+            row[column] = operand.value
 
-    return groups
+    return row
 
 
-def hex_str(num):
-    h = '{0:x}'.format(num)
+def gather_columns(tokens, symbols, width=WIDTH, diagnostics=None):
+    starts = [(0, 0)] # (row, address) where each contiguous segment begins
+    rows = array.array('Q') # ROW values per word, split into columns by combine_columns
+    append = rows.extend
+    orig_flag, word_flag, inst_flag = parse.DIR_ORIG.flag, parse.DIR_WORD.flag, parse.INST.flag
+    index = 0
 
-    for i in range(8 - len(h)):
-        h = '0' + h
+    for token in tokens:
+        if type(token) == int: # already encoded by compact
+            append((token, 0, 0, 0, 0))
+        elif token.kind & orig_flag:
+            address = orig_index(index, token.value)
+
+            if address != index:
+                starts.append((len(rows) // ROW, address))
+
+            index = address
+            continue
+        elif token.kind & (inst_flag | word_flag):
+            try:
+                append(gather_row(symbols, token, index, width))
+            except (UndefinedSymbolException, SemanticException) as e:
+                report(diagnostics, e)
+                append((0, 0, 0, 0, 0)) # a placeholder; the image is discarded once errors are raised
+        else:
+            continue
 
-    return h
+        index += 1
 
+    if diagnostics is not None:
+        diagnostics.check()
 
-def generate(tokens):
-    first_pass(tokens)
-    instructions = second_pass(tokens)
-    groups = create_groups(instructions)
-    current = 0
+    return starts, rows
 
-    print('WIDTH=32;')
-    print('DEPTH=16384;')
-    print('ADDRESS_RADIX=HEX;')
-    print('DATA_RADIX=HEX;')
-    print('CONTENT BEGIN')
 
-    for group in groups:
-        if len(group) == 1:
-            print('{0} : {1};'.format(hex_str(current), hex_str(group[0])))
-            current += 1
+@functools.lru_cache(None)
+def load_numpy():
+    # -> numpy, or None where it is not installed; imported by the first bulk encode rather
+    # than at startup, which it would slow by tens of milliseconds
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
+
+def combine_columns(rows):
+    numpy = load_numpy() if len(rows) else None
+
+    if numpy is not None:
+        columns = numpy.frombuffer(rows, numpy.uint64).reshape(-1, ROW)
+        words = columns[:, 0] | columns[:, IMM_COLUMN]
+
+        for shift, column in COLUMNS.items():
+            words |= columns[:, column] << numpy.uint64(shift)
+
+        return words.tolist()
+
+    first, second, third = sorted(COLUMNS, key=COLUMNS.get)
+    columns = [rows[column::ROW] for column in range(ROW)]
+    return [word | (a << first) | (b << second) | (c << third) | i for word, a, b, c, i in zip(*columns)]
+
+
+def bulk_second_pass(tokens, symbols, width=WIDTH, diagnostics=None):
+    if width > 64: # wider .WORD values do not fit the 64-bit base column
+        return second_pass(tokens, symbols, width, diagnostics)
+
+    starts, rows = gather_columns(tokens, symbols, width, diagnostics)
+    words = combine_columns(rows)
+    memory = image.SparseImage()
+    ends = [row for row, _ in starts[1:]] + [len(words)]
+
+    for (row, address), end in zip(starts, ends):
+        if end > row: # an .ORIG may move past a segment before it holds any words
+            memory.starts.append(address)
+            memory.segments.append(words[row:end])
+
+    return memory
+
+
+ENCODERS = {
+    'scalar': second_pass,
+    'bulk': bulk_second_pass,
+}
+
+
+def symbol_lines(symbols):
+    yield '; name kind value defined referenced'
+
+    for symbol in sorted(symbols, key=lambda symbol: (symbol.kind, symbol.value, symbol.name)):
+        value = '0x{0:08X}'.format(symbol.value) if symbol.kind == LABEL else str(symbol.value)
+        references = ','.join(str(line_num) for line_num in symbol.references) or '-'
+        yield '{0} {1} {2} {3} {4}'.format(symbol.name, symbol.kind, value, symbol.line_num, references)
+
+
+def hex_str(num, digits=8):
+    return '{0:0{1}x}'.format(num, digits)
+
+
+def mif_lines(runs, depth=DEPTH, width=WIDTH):
+    current = 0
+    digits = (width + 3) // 4
+    single = '{{0:08x}} : {{1:0{0}x}};'.format(digits)
+    ranged = '[{{0:08x}}..{{1:08x}}] : {{2:0{0}x}};'.format(digits)
+
+    yield 'WIDTH={0};'.format(width)
+    yield 'DEPTH={0};'.format(depth)
+    yield 'ADDRESS_RADIX=HEX;'
+    yield 'DATA_RADIX=HEX;'
+    yield 'CONTENT BEGIN'
+
+    for start, value, count in runs:
+        if count == 1:
+            yield single.format(start, value)
         else:
-            print('[{0}..{1}] : {2};'.format(hex_str(current), hex_str(current + len(group) - 1), hex_str(group[0])))
-            current += len(group)
+            yield ranged.format(start, start + count - 1, value)
+
+        current = start + count
+
+    if current < depth:
+        yield ranged.format(current, depth - 1, image.FILL)
+
+    yield 'END;'
+
+
+class Image(object):
+    def __init__(self, memory, symbols, depth=DEPTH, width=WIDTH):
+        self.memory = memory
+        self.symbols = symbols
+        self.depth = depth
+        self.width = width
+
+
+    @property
+    def words(self):
+        return self.memory.words()
+
+
+    def mif(self):
+        return ''.join(line + '\n' for line in mif_lines(self.memory.runs(), self.depth, self.width))
+
+
+def image_words(memory):
+    return sum(len(segment) for segment in memory.segments)
+
+
+def assemble(tokens, depth=DEPTH, width=WIDTH, encoder='scalar', diagnostics=None, stats=None):
+    stats = stats or profiling.NO_STATS
+    symbols = Symbols()
+    stats.call('first_pass', first_pass, tokens, symbols, depth, diagnostics, size=int)
+    memory = stats.call('second_pass', ENCODERS[encoder], tokens, symbols, width, diagnostics, size=image_words)
+    return Image(memory, symbols, depth, width)
+
+
+def generate_lines(tokens, depth=DEPTH, width=WIDTH, encoder='scalar', diagnostics=None, stats=None):
+    stats = stats or profiling.NO_STATS
+    symbols = Symbols()
+    stats.call('first_pass', first_pass, tokens, symbols, depth, diagnostics, size=int)
+
+    if encoder == 'scalar': # streams words straight into the runs, without building an image
+        words = stats.phase('second_pass', encode_tokens(tokens, symbols, width=width, diagnostics=diagnostics))
+    else:
+        words = stats.call('second_pass', ENCODERS[encoder], tokens, symbols, width, diagnostics, size=image_words).items()
+
+    return mif_lines(stats.phase('runs', image.runs(words)), depth, width)
+
 
-    print('[{0}..{1}] : deaddead;'.format(hex_str(current), hex_str(16383)))
-    print('END;')
+def generate(tokens, depth=DEPTH, width=WIDTH, stream=None, encoder='scalar'):
+    output.write_lines(generate_lines(tokens, depth, width, encoder), stream or sys.stdout)
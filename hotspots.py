@@ -0,0 +1,128 @@
+import sys
+import argparse
+import linemap
+
+
+TOP = 20
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Attribute an execution trace to source lines and labels')
+    parser.add_argument('line_map', help='a line map written by assembler.py --line-map')
+    parser.add_argument('trace', help='hex PCs one per line, or \'PC executions [taken]\' counts as simulate.py --trace writes them')
+    parser.add_argument('--source', help='the assembly source, to show each line\'s text')
+    parser.add_argument('--top', type=int, default=TOP, help='rows per table (default: {0})'.format(TOP))
+    return parser.parse_args()
+
+
+class TraceException(Exception):
+    def __init__(self, line_num, message):
+        super().__init__('line {0}: {1}'.format(line_num, message))
+        self.line_num = line_num
+
+
+def read_trace(lines):
+    # -> {word index: [executions, taken]}; in a bare PC list, an instruction was taken
+    # when the next PC is not the following word
+    counts = {}
+    previous = None
+
+    for line_num, line in enumerate(lines, 1):
+        fields = line.split()
+
+        if not fields:
+            continue
+
+        try:
+            word = int(fields[0], 16) // 4
+            executions = int(fields[1]) if len(fields) > 1 else 1
+            taken = int(fields[2]) if len(fields) > 2 else 0
+        except ValueError:
+            raise TraceException(line_num, 'Expecting a hex PC and optional counts, got \'{0}\''.format(line.strip()))
+
+        entry = counts.setdefault(word, [0, 0])
+        entry[0] += executions
+        entry[1] += taken
+
+        if len(fields) == 1:
+            if previous is not None and word != previous + 1:
+                counts[previous][1] += 1
+
+            previous = word
+
+    return counts
+
+
+def aggregate(counts, lines):
+    # -> ({line: [executions, taken]}, {label: executions}); words outside the map fall
+    # under line None and label None
+    by_line = {}
+    by_label = {}
+
+    for word, (executions, taken) in counts.items():
+        entry = by_line.setdefault(lines.line(word), [0, 0])
+        entry[0] += executions
+        entry[1] += taken
+        label = lines.label(word)
+        by_label[label] = by_label.get(label, 0) + executions
+
+    return by_line, by_label
+
+
+def hot_lines(by_line, total, source, top=TOP):
+    yield 'hot lines:'
+
+    for line_num, (executions, _) in sorted(by_line.items(), key=lambda item: -item[1][0])[:top]:
+        text = source[line_num - 1].strip() if source and line_num and line_num <= len(source) else ''
+        yield '{0:>12} {1:>6.1%}  {2:>7}  {3}'.format(executions, executions / total, line_num or '?', text)
+
+
+def hot_labels(by_label, total, top=TOP):
+    yield 'hot labels:'
+
+    for label, executions in sorted(by_label.items(), key=lambda item: -item[1])[:top]:
+        yield '{0:>12} {1:>6.1%}  {2}'.format(executions, executions / total, label or '(before any label)')
+
+
+def taken_branches(by_line, source, top=TOP):
+    yield 'taken branches and jumps:'
+    taken = [(line_num, entry) for line_num, entry in by_line.items() if entry[1]]
+
+    for line_num, (executions, count) in sorted(taken, key=lambda item: -item[1][1])[:top]:
+        text = source[line_num - 1].strip() if source and line_num and line_num <= len(source) else ''
+        yield '{0:>12} of {1:<12} {2:>6.1%}  {3:>7}  {4}'.format(count, executions, count / executions, line_num or '?', text)
+
+
+def report(counts, lines, source=None, top=TOP):
+    by_line, by_label = aggregate(counts, lines)
+    total = sum(executions for executions, _ in counts.values()) or 1
+    yield from hot_lines(by_line, total, source, top)
+    yield from hot_labels(by_label, total, top)
+    yield from taken_branches(by_line, source, top)
+
+
+def main(line_map, trace, source_file=None, top=TOP):
+    with open(line_map, 'rb') as f:
+        lines = linemap.LineMap.read(f)
+
+    with open(trace) as f:
+        counts = read_trace(f)
+
+    source = None
+
+    if source_file:
+        with open(source_file) as f:
+            source = f.read().splitlines()
+
+    for line in report(counts, lines, source, top):
+        print(line)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    try:
+        main(args.line_map, args.trace, args.source, args.top)
+    except (linemap.LineMapException, TraceException) as e:
+        print('Error: {0}'.format(str(e)), file=sys.stderr)
+        sys.exit(1)
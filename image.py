@@ -0,0 +1,110 @@
+import bisect
+
+
+FILL = 0xDEADDEAD
+
+
+def runs(items, fill=FILL):
+    start = 0
+    value = None
+    count = 0
+    address = 0
+
+    for next_address, word in items:
+        if next_address > address: # unwritten gap, implicitly filled
+            if count and value == fill:
+                count += next_address - address
+            else:
+                if count:
+                    yield start, value, count
+
+                start, value, count = address, fill, next_address - address
+
+        if count and value == word:
+            count += 1
+        else:
+            if count:
+                yield start, value, count
+
+            start, value, count = next_address, word, 1
+
+        address = next_address + 1
+
+    if count:
+        yield start, value, count
+
+
+class SparseImage(object):
+    def __init__(self, fill=FILL):
+        self.starts = []
+        self.segments = [] # word lists, segments[i] begins at starts[i]
+        self.fill = fill
+
+
+    @classmethod
+    def from_items(cls, items, fill=FILL):
+        image = cls(fill)
+
+        for address, word in items:
+            image.write(address, word)
+
+        return image
+
+
+    def __len__(self):
+        if not self.segments:
+            return 0
+
+        return self.starts[-1] + len(self.segments[-1])
+
+
+    def write(self, address, word):
+        if self.segments and address == len(self): # fast path for sequential writes
+            self.segments[-1].append(word)
+            return
+
+        i = bisect.bisect_right(self.starts, address) - 1
+
+        if i >= 0 and address < self.starts[i] + len(self.segments[i]):
+            self.segments[i][address - self.starts[i]] = word
+            return
+
+        if i >= 0 and address == self.starts[i] + len(self.segments[i]):
+            self.segments[i].append(word)
+        else:
+            i += 1
+            self.starts.insert(i, address)
+            self.segments.insert(i, [word])
+
+        if i + 1 < len(self.starts) and self.starts[i + 1] == address + 1:
+            self.segments[i].extend(self.segments.pop(i + 1))
+            self.starts.pop(i + 1)
+
+
+    def read(self, address):
+        i = bisect.bisect_right(self.starts, address) - 1
+
+        if i >= 0 and address < self.starts[i] + len(self.segments[i]):
+            return self.segments[i][address - self.starts[i]]
+
+        return self.fill
+
+
+    def items(self):
+        for start, words in zip(self.starts, self.segments):
+            for offset, word in enumerate(words):
+                yield start + offset, word
+
+
+    def words(self):
+        words = []
+
+        for start, segment in zip(self.starts, self.segments):
+            words.extend([self.fill] * (start - len(words)))
+            words.extend(segment)
+
+        return words
+
+
+    def runs(self):
+        return runs(self.items(), self.fill)
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import parse
+import generate
+import image
+import backends
+import assembler
+
+
+class IncrementalAssembler(object):
+    def __init__(self, engine='table', depth=generate.DEPTH, width=generate.WIDTH, encoder='scalar'):
+        # lines are re-encoded one at a time as they change, so the encoder choice does not apply
+        self.engine = engine
+        self.depth = depth
+        self.width = width
+        self.parsed = {} # sanitized text -> token, or the ParseException it raised
+        self.encoded = {} # (text, index for pc-relative instructions) -> (word, symbol references)
+        self.used = {}
+        self.symbols = generate.Symbols()
+        self.reparsed = 0
+        self.reencoded = 0
+
+
+    def parse_line(self, text, line_num, line):
+        entry = self.parsed.get(text)
+
+        if entry is None:
+            self.reparsed += 1
+
+            try:
+                entry = parse.parse_line(text, line_num, self.engine)
+            except parse.ParseException as e:
+                entry = e
+
+            self.parsed[text] = entry
+
+        if isinstance(entry, parse.ParseException):
+            raise parse.ParseException('Error at line number {0}: {1}, {2}'.format(line_num, line.strip(), str(entry)))
+
+        if entry.line_num != line_num:
+            token = parse.Token(entry.value, entry.tokens, entry.kind)
+            token.line_num = line_num
+            token.text = text
+            self.parsed[text] = entry = token
+
+        return entry
+
+
+    def read_tokens(self, lines):
+        tokens = []
+
+        for line_num, line in enumerate(lines, 1):
+            sanitized = assembler.sanitize_line(line)
+
+            if sanitized:
+                tokens.append(self.parse_line(sanitized, line_num, line))
+
+        return tokens
+
+
+    def changed_symbols(self, symbols):
+        changed = set()
+
+        old, new = self.symbols.table, symbols.table
+
+        for name in old.keys() | new.keys():
+            if name not in old or name not in new or (old[name].kind, old[name].value) != (new[name].kind, new[name].value):
+                changed.add(name)
+
+        return changed
+
+
+    def encode_instruction(self, symbols, token, index):
+        key = (token.text, index if generate.is_pc_relative(token) else None)
+        entry = self.encoded.get(key)
+
+        if entry is None:
+            self.reencoded += 1
+            entry = (generate.encode_instruction(symbols, token, index), generate.symbol_references(token))
+            self.encoded[key] = entry
+
+        self.used[key] = entry
+        return entry[0]
+
+
+    def update(self, source):
+        self.reparsed = 0
+        self.reencoded = 0
+        tokens = self.read_tokens(source.splitlines())
+        symbols = generate.Symbols()
+        generate.first_pass(tokens, symbols, self.depth)
+        changed = self.changed_symbols(symbols)
+
+        if changed:
+            self.encoded = {key: entry for key, entry in self.encoded.items() if changed.isdisjoint(entry[1])}
+
+        self.used = {}
+        memory = image.SparseImage.from_items(generate.encode_tokens(tokens, symbols, self.encode_instruction, self.width))
+        self.encoded = self.used
+        self.symbols = symbols
+        self.parsed = {token.text: token for token in tokens}
+        return generate.Image(memory, symbols, self.depth, self.width)
+
+
+def watch(assembly_file, destination, engine='table', options=None, fmt='mif', interval=0.05):
+    asm = IncrementalAssembler(engine, **(options or {}))
+    last_mtime = None
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+
+    try:
+        while True:
+            try:
+                mtime = os.stat(assembly_file).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            if mtime is not None and mtime != last_mtime:
+                last_mtime = mtime
+                start = time.perf_counter()
+
+                try:
+                    with open(assembly_file) as f:
+                        image = asm.update(f.read())
+
+                    backends.write(image, fmt, destination)
+                    print('{0}: wrote {1} in {2:.1f}ms ({3} lines reparsed, {4} instructions re-encoded)'.format(
+                        assembly_file, destination, (time.perf_counter() - start) * 1000, asm.reparsed, asm.reencoded), file=sys.stderr)
+                except assembler.ERRORS as e:
+                    print(assembler.describe_error(e), file=sys.stderr)
+                except OSError as e: # reported like an assembly error; the next save retries
+                    print('Error: {0}'.format(str(e)), file=sys.stderr)
+
+            time.sleep(interval)
+    except KeyboardInterrupt: # Ctrl-C is how watching ends
+        pass
@@ -0,0 +1,82 @@
+JUMP = 'JUMP'
+BRANCH = 'BRANCH'
+LOAD = 'LOAD'
+STORE = 'STORE'
+FUNCI = 'FUNCI'
+FUNCR = 'FUNCR'
+
+PC_RELATIVE = 'PC_RELATIVE'
+LABEL_OR_NUMBER = 'LABEL_OR_NUMBER'
+NAME_OR_NUMBER = 'NAME_OR_NUMBER'
+SYMBOL_OR_NUMBER = 'SYMBOL_OR_NUMBER'
+
+# mnemonic -> (instruction class, primary opcode, secondary opcode)
+INSTRUCTIONS = {
+    'JAL': (JUMP, 0B001100, 0),
+    'BEQ': (BRANCH, 0B001000, 0),
+    'BLT': (BRANCH, 0B001001, 0),
+    'BLE': (BRANCH, 0B001010, 0),
+    'BNE': (BRANCH, 0B001011, 0),
+    'LB': (LOAD, 0B010000, 0),
+    'LH': (LOAD, 0B010001, 0),
+    'LW': (LOAD, 0B010010, 0),
+    'LD': (LOAD, 0B010011, 0),
+    'LBU': (LOAD, 0B010100, 0),
+    'LHU': (LOAD, 0B010101, 0),
+    'LWU': (LOAD, 0B010110, 0),
+    'SB': (STORE, 0B011000, 0),
+    'SH': (STORE, 0B011001, 0),
+    'SW': (STORE, 0B011010, 0),
+    'SD': (STORE, 0B011011, 0),
+    'ADDI': (FUNCI, 0B100000, 0),
+    'ANDI': (FUNCI, 0B100100, 0),
+    'ORI': (FUNCI, 0B100101, 0),
+    'XORI': (FUNCI, 0B100110, 0),
+    'ADD': (FUNCR, 0B000000, 0B00100000),
+    'AND': (FUNCR, 0B000000, 0B00100100),
+    'OR': (FUNCR, 0B000000, 0B00100101),
+    'XOR': (FUNCR, 0B000000, 0B00100110),
+    'SUB': (FUNCR, 0B000000, 0B00101000),
+    'NAND': (FUNCR, 0B000000, 0B00101100),
+    'NOR': (FUNCR, 0B000000, 0B00101101),
+    'NXOR': (FUNCR, 0B000000, 0B00101110),
+    'EQ': (FUNCR, 0B000000, 0B00001000),
+    'LT': (FUNCR, 0B000000, 0B00001001),
+    'LE': (FUNCR, 0B000000, 0B00001010),
+    'NE': (FUNCR, 0B000000, 0B00001011),
+}
+
+# instruction class -> (operand fields, immediate kind)
+# 'imm(rs)' is a single IMM_REG operand holding both the immediate and rs
+FORMATS = {
+    JUMP: (('rt', 'imm(rs)'), LABEL_OR_NUMBER),
+    BRANCH: (('rs', 'rt', 'imm'), PC_RELATIVE),
+    LOAD: (('rt', 'imm(rs)'), SYMBOL_OR_NUMBER),
+    STORE: (('rt', 'imm(rs)'), NAME_OR_NUMBER),
+    FUNCI: (('rt', 'rs', 'imm'), SYMBOL_OR_NUMBER),
+    FUNCR: (('rd', 'rs', 'rt'), None),
+}
+
+OPCODE_SHIFT = 26
+RS_SHIFT = 20
+RT_SHIFT = 14
+RD_SHIFT = 8
+IMM_MASK = 0B00000000000000000011111111111111
+# the hardware sign-extends every immediate field (see disassemble.sign_extend), so a
+# value past IMM_MAX would come back negative; there are no zero-extended fields
+IMM_MIN = -(IMM_MASK + 1) // 2
+IMM_MAX = IMM_MASK // 2
+# immediates may also be written as the 32-bit two's-complement word they extend to,
+# such as 0xFFFFF020 for a memory-mapped I/O address
+WORD_BITS = 32
+
+# register field -> shift within the instruction word
+SHIFTS = {'rs': RS_SHIFT, 'rt': RT_SHIFT, 'rd': RD_SHIFT}
+
+
+def mnemonics(inst_class):
+    return [mnemonic for mnemonic, entry in INSTRUCTIONS.items() if entry[0] == inst_class]
+
+
+def encode(primary_opcode, secondary_opcode, rs, rt, rd, imm):
+    return (primary_opcode << OPCODE_SHIFT) | (rs << RS_SHIFT) | (rt << RT_SHIFT) | (rd << RD_SHIFT) | (imm & IMM_MASK) | secondary_opcode
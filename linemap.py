@@ -0,0 +1,92 @@
+import sys
+import array
+import bisect
+import struct
+import backends
+
+
+MAGIC = b'A32LINES'
+# magic, mapped words, labels, bytes of label names
+HEADER = struct.Struct('<8sIII')
+
+
+class LineMapException(Exception):
+    pass
+
+
+def little_endian(values):
+    values = array.array(backends.WORD_TYPE, values)
+
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    return values
+
+
+class LineMap(object):
+    # word index -> source line, as parallel sorted arrays searched by bisection, plus the
+    # labels by word index so addresses can be attributed to the code they fall under
+    def __init__(self, words, lines, label_words, labels):
+        self.words = words
+        self.lines = lines
+        self.label_words = label_words
+        self.labels = labels
+
+
+    @classmethod
+    def build(cls, word_lines, labels):
+        # word_lines is (word index, line) in address order, labels {name: word index}
+        words = array.array(backends.WORD_TYPE)
+        lines = array.array(backends.WORD_TYPE)
+
+        for word, line_num in word_lines:
+            words.append(word)
+            lines.append(line_num)
+
+        ordered = sorted(labels.items(), key=lambda label: (label[1], label[0]))
+        return cls(words, lines, array.array(backends.WORD_TYPE, (word for _, word in ordered)), [name for name, _ in ordered])
+
+
+    @classmethod
+    def read(cls, f):
+        header = f.read(HEADER.size)
+
+        if len(header) != HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise LineMapException('Not a line map')
+
+        _, count, label_count, names_size = HEADER.unpack(header)
+        words, lines, label_words = (little_endian(()) for _ in range(3))
+
+        try:
+            for values, size in ((words, count), (lines, count), (label_words, label_count)):
+                values.fromfile(f, size)
+        except EOFError:
+            raise LineMapException('Truncated line map')
+
+        if sys.byteorder != 'little':
+            for values in (words, lines, label_words):
+                values.byteswap()
+
+        names = f.read(names_size).decode()
+        return cls(words, lines, label_words, names.split('\0') if label_count else [])
+
+
+    def write(self, f):
+        names = '\0'.join(self.labels).encode()
+        f.write(HEADER.pack(MAGIC, len(self.words), len(self.label_words), len(names)))
+
+        for values in (self.words, self.lines, self.label_words):
+            f.write(little_endian(values).tobytes())
+
+        f.write(names)
+
+
+    def line(self, word):
+        i = bisect.bisect_left(self.words, word)
+        return self.lines[i] if i < len(self.words) and self.words[i] == word else None
+
+
+    def label(self, word):
+        # the closest label at or before word
+        i = bisect.bisect_right(self.label_words, word) - 1
+        return self.labels[i] if i >= 0 else None
@@ -0,0 +1,122 @@
+RADIXES = {
+    'BIN': 2,
+    'OCT': 8,
+    'DEC': 10,
+    'UNS': 10,
+    'HEX': 16,
+}
+
+
+class MifException(Exception):
+    def __init__(self, line_num, message='Malformed MIF'):
+        super().__init__('line {0}: {1}'.format(line_num, message))
+        self.line_num = line_num
+
+
+def strip_comment(line):
+    line = line.split('--')[0]
+
+    while '%' in line: # % ... % block comments, on a single line
+        before, _, after = line.partition('%')
+        line = before + after.partition('%')[2]
+
+    return line.strip()
+
+
+class MifReader(object):
+    # streams a MIF file: the header is parsed up front, then content is read one line
+    # at a time as (start, end, value) segments, so images are never held in memory
+    def __init__(self, f):
+        self.lines = enumerate(f, 1)
+        self.line_num = 0
+        self.width = None
+        self.depth = None
+        self.address_radix = RADIXES['HEX']
+        self.data_radix = RADIXES['HEX']
+        self.read_header()
+
+
+    def read_header(self):
+        content = False
+
+        for self.line_num, line in self.lines:
+            line = strip_comment(line).upper()
+
+            if not line:
+                continue
+            elif line == 'CONTENT':
+                content = True
+            elif (line == 'BEGIN' and content) or line.split() == ['CONTENT', 'BEGIN']:
+                break
+            else:
+                key, equals, value = line.rstrip(';').partition('=')
+                key, value = key.strip(), value.strip()
+
+                if not equals:
+                    raise MifException(self.line_num, 'Expecting a header setting, got \'{0}\''.format(line))
+                elif key in ('WIDTH', 'DEPTH'):
+                    setattr(self, key.lower(), self.parse_int(value, 10))
+                elif key in ('ADDRESS_RADIX', 'DATA_RADIX'):
+                    if value not in RADIXES:
+                        raise MifException(self.line_num, 'Unknown radix \'{0}\''.format(value))
+
+                    setattr(self, key.lower(), RADIXES[value])
+        else:
+            raise MifException(self.line_num, 'Missing CONTENT BEGIN')
+
+        if self.width is None or self.depth is None:
+            raise MifException(self.line_num, 'Header must set WIDTH and DEPTH')
+
+
+    def parse_int(self, text, radix):
+        try:
+            return int(text, radix)
+        except ValueError:
+            raise MifException(self.line_num, 'Expecting a base {0} number, got \'{1}\''.format(radix, text))
+
+
+    def __iter__(self):
+        return self.segments()
+
+
+    def segments(self):
+        end = -1
+
+        for self.line_num, line in self.lines:
+            line = strip_comment(line)
+
+            if not line:
+                continue
+            elif line.upper() == 'END;':
+                return
+
+            addresses, colon, values = line.rstrip(';').partition(':')
+            addresses = addresses.strip()
+
+            if not colon:
+                raise MifException(self.line_num, 'Expecting \'address : value\', got \'{0}\''.format(line))
+
+            if addresses[:1] == '[':
+                first, _, last = addresses.strip('[]').partition('..')
+                start, stop = self.parse_int(first, self.address_radix), self.parse_int(last, self.address_radix)
+                values = [self.parse_int(values.strip(), self.data_radix)]
+            else:
+                start = self.parse_int(addresses, self.address_radix)
+                values = [self.parse_int(value, self.data_radix) for value in values.split()]
+                stop = start + len(values) - 1
+
+            if start <= end:
+                raise MifException(self.line_num, 'Addresses must be listed in increasing order')
+
+            if stop >= self.depth or stop < start:
+                raise MifException(self.line_num, 'Address range {0}..{1} is outside DEPTH={2}'.format(start, stop, self.depth))
+
+            if len(values) == 1:
+                yield start, stop, values[0]
+            else: # 'address : v1 v2 ...' lists consecutive words
+                for address, value in enumerate(values, start):
+                    yield address, address, value
+
+            end = stop
+
+        raise MifException(self.line_num, 'Missing END')
@@ -0,0 +1,106 @@
+import os
+import stat
+import contextlib
+
+
+BATCH_LINES = 4096
+COPY_CHARS = 1024 * 1024
+
+
+def file_mode(path):
+    # the mode a plain open() would give path: an existing file keeps its own, a new one
+    # gets 0666 less the umask (mkstemp's 0600 would otherwise survive the replace)
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextlib.contextmanager
+def open_atomic(path, mode='w'):
+    import tempfile # not needed to write to stdout
+
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+
+        os.chmod(temp_path, file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def write_atomic(path, data):
+    with open_atomic(path, 'wb' if isinstance(data, bytes) else 'w') as f:
+        f.write(data)
+
+
+def write_lines(lines, f):
+    batch = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) == BATCH_LINES:
+            batch.append('')
+            f.write('\n'.join(batch))
+            batch = []
+
+    if batch:
+        batch.append('')
+        f.write('\n'.join(batch))
+
+
+class Spool(object):
+    # holds what is written until release, so a stream gets nothing if producing the lines
+    # fails part way; the first write stays in memory, any later ones in a temporary file
+    def __init__(self):
+        self.head = ''
+        self.file = None
+
+
+    def write(self, text):
+        if not self.head:
+            self.head = text
+            return
+
+        if self.file is None:
+            import tempfile # only for output longer than one batch
+            self.file = tempfile.TemporaryFile('w+')
+
+        self.file.write(text)
+
+
+    def release(self, stream):
+        stream.write(self.head)
+
+        if self.file is not None:
+            self.file.seek(0)
+
+            for block in iter(lambda: self.file.read(COPY_CHARS), ''):
+                stream.write(block)
+
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def write_output(lines, path=None, stream=None):
+    if path:
+        with open_atomic(path) as f:
+            write_lines(lines, f)
+    else:
+        spool = Spool()
+
+        try:
+            write_lines(lines, spool)
+            spool.release(stream)
+        finally:
+            spool.close()
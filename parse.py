@@ -1,5 +1,7 @@
-from regex import re_wrap, re_unwrap, re_or, re_combine
+from regex import re_wrap, re_unwrap, re_or, re_combine, grammars
 import re
+import functools
+import isa
 
 SPACE = re_wrap('\s+')
 OPTIONAL_SPACE = re_wrap('\s*')
@@ -29,43 +31,22 @@ REG_S = re_wrap('S[0-9]|S1[0-5]')
 REG = re_or(REG_ZERO, REG_RV, REG_RA, REG_SP, REG_GP, REG_FP, REG_A, REG_T, REG_S)
 IMM = re_or(IDENTIFIER, NUMBER)
 IMM_REG = re_combine(IMM, '\(', REG, '\)')
-OP_BEQ = re_wrap('BEQ')
-OP_BLT = re_wrap('BLT')
-OP_BLE = re_wrap('BLE')
-OP_BNE = re_wrap('BNE')
-OP_JAL = re_wrap('JAL')
-OP_LB = re_wrap('LB')
-OP_LH = re_wrap('LH')
-OP_LW = re_wrap('LW')
-OP_LD = re_wrap('LD')
-OP_LBU = re_wrap('LBU')
-OP_LHU = re_wrap('LHU')
-OP_LWU = re_wrap('LWU')
-OP_SB = re_wrap('SB')
-OP_SH = re_wrap('SH')
-OP_SW = re_wrap('SW')
-OP_SD = re_wrap('SD')
-OP_ADDI = re_wrap('ADDI')
-OP_ANDI = re_wrap('ANDI')
-OP_ORI = re_wrap('ORI')
-OP_XORI = re_wrap('XORI')
-OP_ADD = re_wrap('ADD')
-OP_AND = re_wrap('AND')
-OP_OR = re_wrap('OR')
-OP_XOR = re_wrap('XOR')
-OP_SUB = re_wrap('SUB')
-OP_NAND = re_wrap('NAND')
-OP_NOR = re_wrap('NOR')
-OP_NXOR = re_wrap('NXOR')
-OP_EQ = re_wrap('EQ')
-OP_LT = re_wrap('LT')
-OP_LE = re_wrap('LE')
-OP_NE = re_wrap('NE')
-OP_BRANCH = re_or(OP_BEQ, OP_BLT, OP_BLE, OP_BNE)
-OP_LOAD = re_or(OP_LB, OP_LH, OP_LW, OP_LD, OP_LBU, OP_LHU, OP_LWU)
-OP_STORE = re_or(OP_SB, OP_SH, OP_SW, OP_SD)
-OP_FUNCI = re_or(OP_ADDI, OP_ANDI, OP_ORI, OP_XORI)
-OP_FUNCR = re_or(OP_ADD, OP_AND, OP_OR, OP_XOR, OP_SUB, OP_NAND, OP_NOR, OP_NXOR, OP_EQ, OP_LT, OP_LE, OP_NE)
+OPS = {mnemonic: re_wrap(mnemonic) for mnemonic in isa.INSTRUCTIONS}
+globals().update(('OP_' + mnemonic, op) for mnemonic, op in OPS.items())
+
+
+def class_ops(inst_class):
+    return [OPS[mnemonic] for mnemonic in isa.mnemonics(inst_class)]
+
+
+CLASS_OPS = {inst_class: class_ops(inst_class) for inst_class in isa.FORMATS} # built once, for the regex engine
+
+OP_JUMP = re_or(*class_ops(isa.JUMP))
+OP_BRANCH = re_or(*class_ops(isa.BRANCH))
+OP_LOAD = re_or(*class_ops(isa.LOAD))
+OP_STORE = re_or(*class_ops(isa.STORE))
+OP_FUNCI = re_or(*class_ops(isa.FUNCI))
+OP_FUNCR = re_or(*class_ops(isa.FUNCR))
 PS_NOT = re_combine('NOT', SPACE, REG, ',', REG)
 PS_CALL = re_combine('CALL', SPACE, IMM_REG)
 PS_RET = re_wrap('RET')
@@ -77,7 +58,7 @@ PS_GT = re_combine('GT', SPACE, REG, ',', REG, ',', REG)
 PS_GE = re_combine('GE', SPACE, REG, ',', REG, ',', REG)
 PS_SUBI = re_combine('SUBI', SPACE, REG, ',', REG, ',', IMM)
 PSUEDO = re_or(PS_NOT, PS_CALL, PS_RET, PS_JMP, PS_BGT, PS_BGE, PS_BR, PS_GT, PS_GE, PS_SUBI)
-INST_JUMP = re_combine(OP_JAL, SPACE, REG, ',', IMM_REG)
+INST_JUMP = re_combine(OP_JUMP, SPACE, REG, ',', IMM_REG)
 INST_BRANCH = re_combine(OP_BRANCH, SPACE, REG, ',', REG, ',', IDENTIFIER)
 INST_LOAD = re_combine(OP_LOAD, SPACE, REG, ',', IMM_REG)
 INST_STORE = re_combine(OP_STORE, SPACE, REG, ',', IMM_REG)
@@ -85,80 +66,79 @@ INST_FUNCI = re_combine(OP_FUNCI, SPACE, REG, ',', REG, ',', IMM)
 INST_FUNCR = re_combine(OP_FUNCR, SPACE, REG, ',', REG, ',', REG)
 INST = re_or(INST_JUMP, INST_BRANCH, INST_LOAD, INST_STORE, INST_FUNCI, INST_FUNCR)
 
+LITERAL_CACHE = 65536
+
 
 class ParseException(Exception):
     pass
 
 
 class Token(object):
-    def __init__(self, value, tokens=None):
+    __slots__ = ('value', 'tokens', 'kind', 'line_num', 'text')
+
+    def __init__(self, value, tokens=None, kind=0):
         self.value = value
         self.tokens = tokens
-        self.token_types = []
-        self.attributes = {}
+        self.kind = kind
+        self.line_num = None
+        self.text = None
 
 
-    def add_type(self, token_type):
-        self.token_types.append(token_type)
+    @property
+    def token_types(self):
+        return grammars(self.kind)
 
 
-    def add_attribute(self, key, value):
-        self.attributes[key] = value
+    @property
+    def attributes(self):
+        return {key: getattr(self, key) for key in ('line_num', 'text') if getattr(self, key) is not None}
 
 
-    def is_type(self, token_type):
-        return token_type in self.token_types
-
+    def add_type(self, token_type):
+        self.kind |= token_type.flag
 
-def split_on_spaces(text):
-    return [x for x in re.split('\s', text) if x.strip()]
 
+    def add_attribute(self, key, value):
+        setattr(self, key, value)
 
-def parse_decimal(text):
-    try:
-        token = Token(int(text))
-    except:
-        raise ParseException('Expecting number, got \'{0}\''.format(text))
 
-    token.add_type(DECIMAL)
-    return token
+    def is_type(self, token_type):
+        return self.kind & token_type.flag != 0
 
 
-def parse_hex_digit(c):
-    if re.match('\d', c):
-        return int(c)
-    else:
-        return ord(c) - ord('A') + 10
+    def to_record(self):
+        tokens = tuple(token.to_record() for token in self.tokens) if self.tokens is not None else None
+        return (self.value, self.kind, tokens, self.line_num, self.text)
 
 
-def parse_hex_number(text):
-    c = text[-1]
-    num = 0
-    digit = 0
+    @classmethod
+    def from_record(cls, record):
+        value, kind, tokens, line_num, text = record
+        token = cls(value, tuple(map(cls.from_record, tokens)) if tokens is not None else None, kind)
+        token.line_num = line_num
+        token.text = text
+        return token
 
-    while c != 'x':
-        num += parse_hex_digit(c) * (16 ** digit)
-        digit += 1
-        c = text[-1 * digit - 1]
 
-    return num
+def split_on_spaces(text):
+    return [x for x in re.split('\s', text) if x.strip()]
 
 
-def parse_hex(text):
-    num = parse_hex_number(text)
-    token = Token(num)
-    token.add_type(HEX)
-    return token
+@functools.lru_cache(LITERAL_CACHE)
+def parse_literal(text):
+    # -> (value, token kind); literals repeat heavily in data-heavy programs, so results are cached
+    try:
+        if text[:2].upper() == '0X':
+            return int(text, 16), HEX.flag | NUMBER.flag
+        else:
+            return int(text, 10), DECIMAL.flag | NUMBER.flag
+    except ValueError:
+        raise ParseException('Expecting number, got \'{0}\''.format(text))
 
 
 def parse_number(text):
-    if HEX.match(text):
-        token = parse_hex(text)
-    else:
-        token = parse_decimal(text)
-
-    token.add_type(NUMBER)
-    return token
+    value, kind = parse_literal(text)
+    return Token(value, None, kind)
 
 
 def parse_identifier(text):
@@ -271,7 +251,7 @@ def create_privelidged_jump(reg_text, imm_reg_text):
         raise ParseException('Unrecognized system register \'{0}\''.format(reg_text))
 
     op_token = Token('JAL')
-    op_token.add_type(OP_JAL)
+    op_token.add_type(OPS['JAL'])
     reg_token = Token(int(reg_text[1:]))
     reg_token.add_type(REG)
     imm_reg_token = parse_imm_reg(imm_reg_text)
@@ -321,13 +301,16 @@ def parse_instruction(text):
     op_token = Token(op)
 
     if INST_JUMP.match(text):
-        op_token.add_type(OP_JAL)
+        for jump_op in CLASS_OPS[isa.JUMP]:
+            if jump_op.match(op):
+                op_token.add_type(jump_op)
+
         reg_token = parse_reg(args[0])
         imm_reg_token = parse_imm_reg(args[1])
         children = (op_token, reg_token, imm_reg_token)
         inst_type = INST_JUMP
     elif INST_BRANCH.match(text):
-        for branch_op in [OP_BEQ, OP_BLT, OP_BLE, OP_BNE]:
+        for branch_op in CLASS_OPS[isa.BRANCH]:
             if branch_op.match(op):
                 op_token.add_type(branch_op)
 
@@ -337,7 +320,7 @@ def parse_instruction(text):
         children = (op_token, reg_token1, reg_token2, identifier_token)
         inst_type = INST_BRANCH
     elif INST_LOAD.match(text):
-        for load_op in [OP_LB, OP_LH, OP_LW, OP_LD, OP_LBU, OP_LHU, OP_LWU]:
+        for load_op in CLASS_OPS[isa.LOAD]:
             if load_op.match(op):
                 op_token.add_type(load_op)
 
@@ -346,7 +329,7 @@ def parse_instruction(text):
         children = (op_token, reg_token, imm_reg_token)
         inst_type = INST_LOAD
     elif INST_STORE.match(text):
-        for store_op in [OP_SB, OP_SH, OP_SW, OP_SD]:
+        for store_op in CLASS_OPS[isa.STORE]:
             if store_op.match(op):
                 op_token.add_type(store_op)
 
@@ -355,7 +338,7 @@ def parse_instruction(text):
         children = (op_token, reg_token, imm_reg_token)
         inst_type = INST_STORE
     elif INST_FUNCI.match(text):
-        for func_op in [OP_ADDI, OP_ANDI, OP_ORI, OP_XORI]:
+        for func_op in CLASS_OPS[isa.FUNCI]:
             if func_op.match(op):
                 op_token.add_type(func_op)
 
@@ -365,7 +348,7 @@ def parse_instruction(text):
         children = (op_token, reg_token1, reg_token2, imm_token)
         inst_type = INST_FUNCI
     elif INST_FUNCR.match(text):
-        for func_op in [OP_ADD, OP_AND, OP_OR, OP_XOR, OP_SUB, OP_NAND, OP_NOR, OP_NXOR, OP_EQ, OP_LT, OP_LE, OP_NE]:
+        for func_op in CLASS_OPS[isa.FUNCR]:
             if func_op.match(op):
                 op_token.add_type(func_op)
 
@@ -383,19 +366,218 @@ def parse_instruction(text):
     return token
 
 
-def parse_line(text, line_num):
+def parse_statement_regex(text):
     if INST.match(text):
-        token = parse_instruction(text)
+        return parse_instruction(text)
     elif PSUEDO.match(text):
-        token = parse_pseudo(text)
+        return parse_pseudo(text)
     elif LABEL_DEF.match(text):
-        token = parse_label_def(text)
+        return parse_label_def(text)
     elif DIR.match(text):
-        token = parse_dir(text)
+        return parse_dir(text)
     else:
         raise ParseException('Unrecognized statement \'{0}\''.format(text))
 
-    token.add_attribute('line_num', line_num)
-    token.add_attribute('text', text)
+
+# register name -> (register number, token kind)
+REGISTERS = {
+    'ZERO': (0, REG_ZERO.flag | REG.flag),
+    'RV': (1, REG_RV.flag | REG.flag),
+    'RA': (2, REG_RA.flag | REG.flag),
+    'SP': (3, REG_SP.flag | REG.flag),
+    'GP': (4, REG_GP.flag | REG.flag),
+    'FP': (5, REG_FP.flag | REG.flag),
+}
+
+for i in range(16):
+    REGISTERS['A{0}'.format(i)] = (i + 16, REG_A.flag | REG.flag)
+    REGISTERS['T{0}'.format(i)] = (i + 32, REG_T.flag | REG.flag)
+    REGISTERS['S{0}'.format(i)] = (i + 48, REG_S.flag | REG.flag)
+
+# instruction class -> (instruction type, operand schema)
+INSTRUCTION_CLASSES = {
+    isa.JUMP: (INST_JUMP, (REG, IMM_REG)),
+    isa.BRANCH: (INST_BRANCH, (REG, REG, IDENTIFIER)),
+    isa.LOAD: (INST_LOAD, (REG, IMM_REG)),
+    isa.STORE: (INST_STORE, (REG, IMM_REG)),
+    isa.FUNCI: (INST_FUNCI, (REG, REG, IMM)),
+    isa.FUNCR: (INST_FUNCR, (REG, REG, REG)),
+}
+
+# mnemonic -> (instruction type, opcode, operand schema)
+INSTRUCTIONS = {}
+
+for mnemonic, (inst_class, _, _) in isa.INSTRUCTIONS.items():
+    inst_type, schema = INSTRUCTION_CLASSES[inst_class]
+    INSTRUCTIONS[mnemonic] = (inst_type, OPS[mnemonic], schema)
+
+# mnemonic -> (operand schema, expansion), expansion is None for privileged jumps
+PSEUDO_INSTRUCTIONS = {
+    'NOT': ((REG, REG), 'NAND {0},{1},{1}'),
+    'CALL': ((IMM_REG,), 'JAL RA,{0}'),
+    'RET': ((), None),
+    'JMP': ((IMM_REG,), None),
+    'BGT': ((REG, REG, IDENTIFIER), 'BGT {1},{0},{2}'),
+    'BGE': ((REG, REG, IDENTIFIER), 'BLE {1},{0},{2}'),
+    'BR': ((IDENTIFIER,), 'BEQ Zero,Zero,{0}'),
+    'GT': ((REG, REG, REG), 'LT {0},{2},{1}'),
+    'GE': ((REG, REG, REG), 'LE {0},{2},{1}'),
+    'SUBI': ((REG, REG, IMM), 'ADDI {0},{1},-{2}'),
+}
+
+DIRECTIVES = {
+    '.ORIG': (DIR_ORIG, parse_dir_orig),
+    '.WORD': (DIR_WORD, parse_dir_word),
+    '.NAME': (DIR_NAME, parse_dir_name),
+}
+
+
+def tokenize(text):
+    split = text.split()
+
+    if not split or text[0].isspace() or text[-1].isspace():
+        return None, None
+    elif len(split) == 1:
+        return split[0], []
+    elif len(split) == 2:
+        return split[0], split[1].split(',')
+    else:
+        return split[0], None
+
+
+def parse_reg_operand(text):
+    entry = REGISTERS.get(text.upper())
+
+    if entry is None:
+        return None
+
+    return Token(entry[0], None, entry[1])
+
+
+def parse_identifier_operand(text):
+    if IDENTIFIER.match(text):
+        return parse_identifier(text)
+
+
+def parse_imm_operand(text):
+    if IMM.match(text):
+        return parse_imm(text)
+
+
+def parse_imm_reg_operand(text):
+    if text[-1:] != ')':
+        return None
+
+    imm_text, paren, reg_text = text[:-1].partition('(')
+    imm_token = parse_imm_operand(imm_text)
+    reg_token = parse_reg_operand(reg_text)
+
+    if imm_token is None or reg_token is None:
+        return None
+
+    return Token(None, (imm_token, reg_token), IMM_REG.flag)
+
+
+OPERANDS = {
+    REG: parse_reg_operand,
+    IDENTIFIER: parse_identifier_operand,
+    IMM: parse_imm_operand,
+    IMM_REG: parse_imm_reg_operand,
+}
+
+
+def parse_operands(schema, args):
+    if args is None or len(args) != len(schema):
+        return None
+
+    tokens = []
+
+    for operand, arg in zip(schema, args):
+        token = OPERANDS[operand](arg)
+
+        if token is None:
+            return None
+
+        tokens.append(token)
+
+    return tokens
+
+
+def build_instruction(op, args):
+    entry = INSTRUCTIONS.get(op.upper())
+
+    if entry is None:
+        return None
+
+    inst_type, op_type, schema = entry
+    operands = parse_operands(schema, args)
+
+    if operands is None:
+        return None
+
+    operands.insert(0, Token(op, None, op_type.flag))
+    return Token(None, tuple(operands), inst_type.flag | INST.flag)
+
+
+def build_pseudo(op, args):
+    schema, expansion = PSEUDO_INSTRUCTIONS[op.upper()]
+
+    if parse_operands(schema, args) is None:
+        return None
+
+    if expansion is None:
+        return create_privelidged_jump('R6', args[0] if args else '0(RA)')
+
+    op, args = tokenize(expansion.format(*args))
+    token = build_instruction(op, args)
+
+    if token is None:
+        raise ParseException('Instruction parse failure')
+
+    return token
+
+
+def parse_statement_table(text):
+    op, args = tokenize(text)
+    mnemonic = op.upper() if op else None
+    token = None
+
+    if mnemonic in INSTRUCTIONS:
+        token = build_instruction(op, args)
+    elif mnemonic in PSEUDO_INSTRUCTIONS:
+        token = build_pseudo(op, args)
+    elif mnemonic in DIRECTIVES:
+        grammar, parse_directive = DIRECTIVES[mnemonic]
+
+        if grammar.match(text):
+            token = parse_directive(text)
+            token.add_type(DIR)
+    elif LABEL_DEF.match(text):
+        token = parse_label_def(text)
+
+    if token is None:
+        raise ParseException('Unrecognized statement \'{0}\''.format(text))
+
+    return token
+
+
+ENGINES = {
+    'table': parse_statement_table,
+    'regex': parse_statement_regex,
+}
+
+
+def parse_line(text, line_num, engine='table', diagnostics=None):
+    try:
+        token = ENGINES[engine](text)
+    except ParseException as e:
+        if diagnostics is None:
+            raise
+
+        diagnostics.error(line_num, str(e), text)
+        return None
+
+    token.line_num = line_num
+    token.text = text
 
     return token
@@ -0,0 +1,193 @@
+import time
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+
+class Phase(object):
+    __slots__ = ('seconds', 'items')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.items = 0
+
+
+class Stats(object):
+    # phases nest as the pipeline's generators pull from one another, so each phase is
+    # charged only the time spent in its own code, not in the phases it pulls from
+    def __init__(self, trace_memory=True):
+        import tracemalloc # only --stats needs it, and NO_STATS never gets here
+
+        self.phases = {}
+        self.counters = {}
+        self.running = [] # [phase name, time it last resumed], innermost last
+        self.trace_memory = trace_memory and not tracemalloc.is_tracing()
+        self.wall = None
+        self.peak_memory = None
+
+        if self.trace_memory:
+            tracemalloc.start()
+
+        self.started = time.perf_counter()
+
+
+    def enter(self, name):
+        now = time.perf_counter()
+
+        if self.running:
+            self.charge(*self.running[-1], now)
+
+        self.running.append([name, now])
+
+
+    def leave(self):
+        now = time.perf_counter()
+        self.charge(*self.running.pop(), now)
+
+        if self.running:
+            self.running[-1][1] = now
+
+
+    def charge(self, name, resumed, now):
+        self.phases.setdefault(name, Phase()).seconds += now - resumed
+
+
+    def count(self, name, items=1):
+        self.counters[name] = self.counters.get(name, 0) + items
+
+
+    def phase(self, name, items, counter=None, size=None):
+        # wraps an iterable so pulling each item is timed as this phase and counted toward
+        # its throughput; size(item) is also added to the named counter
+        phase = self.phases.setdefault(name, Phase())
+        items = iter(items)
+
+        while True:
+            self.enter(name)
+
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.leave()
+
+            phase.items += 1
+
+            if counter:
+                self.count(counter, size(item))
+
+            yield item
+
+
+    def call(self, name, function, *args, size=None, **kwargs):
+        # times a call as this phase; size(result) is the number of items it handled
+        phase = self.phases.setdefault(name, Phase())
+        self.enter(name)
+
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            self.leave()
+
+        if size:
+            phase.items += size(result)
+
+        return result
+
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.started
+
+        if self.trace_memory:
+            import tracemalloc
+
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+
+    def report(self):
+        if self.wall is None:
+            self.finish()
+
+        phases = {}
+
+        for name, phase in self.phases.items():
+            phases[name] = {
+                'seconds': round(phase.seconds, 6),
+                'items': phase.items,
+                'items_per_second': round(phase.items / phase.seconds) if phase.seconds and phase.items else None,
+            }
+
+        return {
+            'wall_seconds': round(self.wall, 6),
+            'peak_traced_bytes': self.peak_memory,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            'counters': self.counters,
+            'phases': phases,
+        }
+
+
+    def json(self):
+        import json
+
+        return json.dumps(self.report(), indent=2)
+
+
+class NullStats(object):
+    # stands in when stats are off, so callers need not check
+    def count(self, name, items=1):
+        pass
+
+
+    def phase(self, name, items, counter=None, size=None):
+        return items
+
+
+    def call(self, name, function, *args, size=None, **kwargs):
+        return function(*args, **kwargs)
+
+
+NO_STATS = NullStats()
+
+
+def token_count(token):
+    # the tokens parse created for one statement, operands included
+    return 1 + sum(token_count(child) for child in token.tokens or ())
+
+
+class Histogram(object):
+    # latencies in power-of-two millisecond buckets, each counting the samples up to its bound
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+    def add(self, seconds):
+        bound = 1
+
+        while bound < seconds * 1000:
+            bound *= 2
+
+        self.buckets[bound] = self.buckets.get(bound, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+    def report(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else None,
+            'max_ms': round(self.max * 1000, 3),
+            'buckets_ms': {str(bound): self.buckets[bound] for bound in sorted(self.buckets)},
+        }
+
+
+    def lines(self):
+        for bound in sorted(self.buckets):
+            yield '{0:>8} ms: {1:>8} {2}'.format('<= ' + str(bound), self.buckets[bound], '#' * max(1, 40 * self.buckets[bound] // self.count))
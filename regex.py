@@ -1,5 +1,46 @@
 import re
 
+
+GRAMMARS = []
+
+
+class Grammar(object):
+    # patterns compile on first use rather than at import, since most of the hundred or
+    # so that parse.py builds are only pieces of larger ones, or belong to an engine the
+    # run does not use; the first match swaps in the compiled pattern's own match method
+    __slots__ = ('pattern', 'compiled', 'match', 'flag')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.compiled = None
+        self.match = self.compile_and_match
+        self.flag = 1 << len(GRAMMARS)
+        GRAMMARS.append(self)
+
+
+    @property
+    def regex(self):
+        if self.compiled is None:
+            self.compiled = re.compile(self.pattern, re.IGNORECASE)
+            self.match = self.compiled.match
+
+        return self.compiled
+
+
+    def compile_and_match(self, text):
+        return self.regex.match(text)
+
+
+def compile_all():
+    # compiles every grammar up front, as import used to
+    for grammar in GRAMMARS:
+        grammar.regex
+
+
+def grammars(kind):
+    return [grammar for grammar in GRAMMARS if kind & grammar.flag]
+
+
 def re_unwrap(regex):
     pattern = regex.pattern
 
@@ -16,7 +57,7 @@ def re_unwrap(regex):
 
 
 def re_wrap(pattern):
-    return re.compile('^({0})$'.format(pattern), re.IGNORECASE)
+    return Grammar('^({0})$'.format(pattern))
 
 
 def re_or(*args):
@@ -41,5 +82,3 @@ def re_combine(*args):
             pattern += re_unwrap(arg)
 
     return re_wrap(pattern)
-
-
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import concurrent.futures
+import assembler
+import backends
+import output
+import profiling
+import regex
+
+
+SOCKET = os.environ.get('CS3220_ASM_SOCKET') or os.path.join(os.environ.get('TMPDIR') or '/tmp', 'cs3220-asm-{0}.sock'.format(os.getuid()))
+
+# protocol: the client sends one JSON request line, then reads one JSON response line
+# followed by 'length' bytes of output. A request names a source 'path' or carries its
+# 'text', with an optional 'output' path to write instead of returning the bytes, and
+# optional 'format' and 'options'; {'command': 'stats'} returns the latency histogram
+
+
+def check_request(request):
+    # a request no assembly could serve is answered as malformed by handle, rather than
+    # failing inside the worker
+    if not isinstance(request, dict):
+        raise ValueError('not a JSON object')
+
+    if not isinstance(request.get('options', {}), dict) or request.get('format', 'mif') not in backends.BACKENDS:
+        raise ValueError('bad options or format')
+
+    if 'text' in request:
+        fields = (('text', request['text']), ('path', request.get('path') or ''))
+    else:
+        fields = (('path', request.get('path')),)
+
+    for name, value in fields + (('output', request.get('output') or ''),):
+        if not isinstance(value, str):
+            raise ValueError('{0} is not a string'.format(name))
+
+
+def assemble_request(request, engine='table', cache=None, options=None):
+    # each assembly builds its own symbol table and diagnostics, so nothing one request
+    # defines is visible to the next, whichever worker runs it
+    options = dict(options or {}, **request.get('options', {}))
+    fmt = request.get('format', 'mif')
+    hits = cache.hits if cache else 0
+
+    try:
+        if 'text' in request:
+            data = assembler.render_output(request['text'].splitlines(), engine, options, fmt, request.get('path'))
+        else:
+            data = assembler.assemble_output(request['path'], engine, cache, options, fmt)
+
+        if request.get('output'):
+            output.write_atomic(request['output'], data)
+            data = b''
+
+        response = {'status': 'ok', 'length': len(data)}
+    except assembler.ERRORS as e:
+        data = b''
+        response = {'status': 'error', 'message': assembler.describe_error(e), 'errors': json.loads(assembler.error_json(e))['errors']}
+    except Exception as e:
+        data = b''
+        response = {'status': 'error', 'message': 'Error: {0}'.format(str(e))}
+
+    response['cached'] = bool(cache and cache.hits > hits)
+    return response, data
+
+
+def warm():
+    # compiled up front in each worker, so no request pays for it
+    regex.compile_all()
+
+
+class Server(object):
+    def __init__(self, path=SOCKET, engine='table', cache=None, options=None, workers=None):
+        self.path = path
+        self.engine = engine
+        self.cache = cache
+        self.options = options
+        self.latency = profiling.Histogram()
+        self.hits = 0
+        self.misses = 0
+        warm()
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=warm) if workers != 1 else None
+
+
+    async def handle(self, reader, writer):
+        started = time.perf_counter()
+
+        try:
+            request = json.loads(await reader.readline())
+
+            if isinstance(request, dict) and request.get('command') == 'stats':
+                response, data = dict(self.latency.report(), status='ok', length=0), b''
+            else:
+                check_request(request)
+                response, data = await asyncio.get_running_loop().run_in_executor(self.executor, assemble_request, request, self.engine, self.cache, self.options)
+
+                if self.cache and 'text' not in request: # text requests bypass the cache
+                    self.hits += response['cached']
+                    self.misses += not response['cached']
+
+                self.latency.add(time.perf_counter() - started)
+        except ValueError:
+            response, data = {'status': 'error', 'message': 'Error: malformed request', 'length': 0}, b''
+
+        try:
+            writer.write(json.dumps(response).encode() + b'\n' + data)
+            await writer.drain()
+        except ConnectionError: # the client went away; nothing to report to
+            pass
+        finally:
+            writer.close()
+
+
+    def remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+                return
+
+        raise OSError('A server is already listening on {0}'.format(self.path))
+
+
+    async def run(self):
+        self.remove_stale_socket()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        print('serving on {0}'.format(self.path), file=sys.stderr)
+
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+
+        if self.cache:
+            self.cache.save_stats(self.hits, self.misses)
+
+        print('{0} requests'.format(self.latency.count), file=sys.stderr)
+        print('\n'.join(self.latency.lines()), file=sys.stderr)
+
+
+def serve(path=SOCKET, engine='table', cache=None, options=None, workers=None):
+    server = Server(path, engine, cache, options, workers)
+
+    try:
+        asyncio.run(server.run())
+    finally:
+        server.close()
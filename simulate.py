@@ -0,0 +1,394 @@
+import sys
+import time
+import argparse
+import operator
+import isa
+import generate
+import image
+import output
+import mif
+import disassemble
+import assembler
+
+
+STEPS = 10000000
+BYTES = 4 # addresses count 4 bytes per memory word, as the assembler's PC arithmetic does
+
+# load/store mnemonic -> (access bits, sign extended)
+ACCESSES = {
+    'LB': (8, True), 'LH': (16, True), 'LW': (32, True), 'LD': (64, True),
+    'LBU': (8, False), 'LHU': (16, False), 'LWU': (32, False),
+    'SB': (8, False), 'SH': (16, False), 'SW': (32, False), 'SD': (64, False),
+}
+
+# mnemonic -> operation on signed register values; results are wrapped to the width
+OPERATIONS = {
+    'ADD': operator.add, 'ADDI': operator.add,
+    'SUB': operator.sub,
+    'AND': operator.and_, 'ANDI': operator.and_,
+    'OR': operator.or_, 'ORI': operator.or_,
+    'XOR': operator.xor, 'XORI': operator.xor,
+    'NAND': lambda a, b: ~(a & b),
+    'NOR': lambda a, b: ~(a | b),
+    'NXOR': lambda a, b: ~(a ^ b),
+    'EQ': lambda a, b: int(a == b),
+    'LT': lambda a, b: int(a < b),
+    'LE': lambda a, b: int(a <= b),
+    'NE': lambda a, b: int(a != b),
+}
+
+CONDITIONS = {
+    'BEQ': operator.eq,
+    'BLT': operator.lt,
+    'BLE': operator.le,
+    'BNE': operator.ne,
+}
+
+SCRATCH = 64 # writes to Zero land here, so register 0 always reads 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run an assembled CS3220 image and dump the final machine state')
+    parser.add_argument('program', help='a MIF image, or assembly source to assemble first')
+    parser.add_argument('--steps', type=int, default=STEPS, help='stop after this many instructions (default: {0})'.format(STEPS))
+    parser.add_argument('--start', type=lambda text: int(text, 0), default=0, help='byte address execution starts at (default: 0)')
+    parser.add_argument('--trace', metavar='PATH', help='count executions and taken branches per address and write them to PATH, for hotspots.py')
+    parser.add_argument('--parser', choices=sorted(assembler.parse.ENGINES), default='table', help='parsing engine for assembly source (default: table)')
+    parser.add_argument('--depth', type=int, default=generate.DEPTH, help='memory depth in words for assembly source (default: {0})'.format(generate.DEPTH))
+    parser.add_argument('--width', type=int, default=generate.WIDTH, help='memory width in bits for assembly source (default: {0})'.format(generate.WIDTH))
+    return parser.parse_args()
+
+
+class SimulationException(Exception):
+    def __init__(self, pc, message):
+        super().__init__('at address {0}: {1}'.format(generate.hex_str(pc * BYTES), message))
+        self.pc = pc
+
+
+class Halt(Exception):
+    # raised by a branch or jump to itself, the idiom programs end on
+    pass
+
+
+class Simulator(object):
+    # each word is decoded once, the first time it executes, into a handler closed over
+    # its fields; running is then one call per instruction, returning the next PC
+    def __init__(self, words, depth, width=generate.WIDTH, fill=image.FILL):
+        self.depth = depth
+        self.width = width
+        self.memory = words + [fill] * (depth - len(words))
+        self.registers = [0] * (SCRATCH + 1)
+        self.written = set() # words changed by stores, for the dump
+        self.pc = 0
+        self.steps = 0
+        self.counts = None # executions and taken transfers per word, kept by run_counted
+        self.taken = None
+        self.mask = (1 << width) - 1
+        self.half = 1 << (width - 1)
+        # one slot past the end, so falling off memory is reported rather than raising IndexError
+        self.cache = [None] * depth + [self.fall_off]
+
+
+    @classmethod
+    def from_image(cls, memory, depth, width=generate.WIDTH):
+        return cls(memory.words(), depth, width, memory.fill)
+
+
+    @classmethod
+    def from_mif(cls, f):
+        reader = mif.MifReader(f)
+        words = []
+
+        for start, end, value in reader:
+            words.extend([value] * (end - start + 1))
+
+        return cls(words, reader.depth, reader.width)
+
+
+    def fall_off(self, pc):
+        raise SimulationException(pc, 'ran past the end of memory (depth {0})'.format(self.depth))
+
+
+    def run(self, steps=STEPS):
+        # -> True if the program halted, False if it hit the step limit
+        cache = self.cache
+        decode = self.decode
+        pc = self.pc
+        step = -1
+
+        try:
+            for step in range(steps):
+                pc = (cache[pc] or decode(pc))(pc)
+
+            step += 1
+            return False
+        except Halt:
+            step += 1
+            return True
+        finally:
+            self.pc = pc
+            self.steps += step
+
+
+    def run_counted(self, steps=STEPS):
+        # run, also counting executions and taken control transfers per word; a separate
+        # loop, so run itself pays nothing for tracing
+        if self.counts is None:
+            self.counts = [0] * (self.depth + 1)
+            self.taken = [0] * (self.depth + 1)
+
+        cache = self.cache
+        decode = self.decode
+        counts, taken = self.counts, self.taken
+        pc = self.pc
+        step = -1
+
+        try:
+            for step in range(steps):
+                counts[pc] += 1
+                next_pc = (cache[pc] or decode(pc))(pc)
+
+                if next_pc != pc + 1:
+                    taken[pc] += 1
+
+                pc = next_pc
+
+            step += 1
+            return False
+        except Halt:
+            step += 1
+            return True
+        finally:
+            self.pc = pc
+            self.steps += step
+
+
+    def trace_lines(self):
+        # one 'address executions taken' line per word that ran, the trace hotspots.py reads
+        for index, count in enumerate(self.counts or ()):
+            if count:
+                yield '{0} {1} {2}'.format(generate.hex_str(index * BYTES), count, self.taken[index])
+
+
+    def decode(self, pc):
+        decoded = disassemble.decode(self.memory[pc])
+
+        if decoded is None:
+            handler = self.invalid(pc)
+        else:
+            mnemonic, inst_class, fields = decoded
+            handler = HANDLERS[inst_class](self, mnemonic, pc, fields)
+
+        self.cache[pc] = handler
+        return handler
+
+
+    def invalid(self, pc):
+        word = self.memory[pc]
+
+        def handler(pc):
+            raise SimulationException(pc, 'not an instruction: {0}'.format(generate.hex_str(word)))
+
+        return handler
+
+
+    def destination(self, register):
+        return register or SCRATCH
+
+
+    def address_check(self, pc, index):
+        if not 0 <= index < self.depth:
+            raise SimulationException(pc, 'address {0} is outside memory (depth {1})'.format(generate.hex_str(index * BYTES), self.depth))
+
+
+    def branch(self, mnemonic, pc, fields):
+        regs = self.registers
+        condition = CONDITIONS[mnemonic]
+        s, t = fields['rs'], fields['rt']
+        target = pc + 1 + fields['imm']
+
+        if target == pc and condition(0, 0) and s == t: # always taken, to itself
+            def handler(pc):
+                raise Halt()
+        elif not 0 <= target < self.depth:
+            def handler(pc):
+                if condition(regs[s], regs[t]):
+                    self.address_check(pc, target)
+
+                return pc + 1
+        else:
+            def handler(pc):
+                return target if condition(regs[s], regs[t]) else pc + 1
+
+        return handler
+
+
+    def jump(self, mnemonic, pc, fields):
+        regs = self.registers
+        s, t, imm = fields['rs'], self.destination(fields['rt']), fields['imm'] * BYTES
+        depth = self.depth
+
+        def handler(pc):
+            index = (regs[s] + imm) // BYTES
+            regs[t] = (pc + 1) * BYTES
+
+            if index == pc:
+                raise Halt()
+
+            if not 0 <= index < depth:
+                self.address_check(pc, index)
+
+            return index
+
+        return handler
+
+
+    def access(self, mnemonic):
+        # -> (shift mask for the byte offset within a word, access mask, sign bit or 0)
+        bits, signed = ACCESSES[mnemonic]
+        bits = min(bits, self.width)
+        lanes = BYTES - 1 & ~(bits // 8 - 1) if bits < BYTES * 8 else 0
+        return lanes, (1 << bits) - 1, (1 << (bits - 1)) if signed else 0
+
+
+    def load(self, mnemonic, pc, fields):
+        regs, memory = self.registers, self.memory
+        s, t, imm = fields['rs'], self.destination(fields['rt']), fields['imm']
+        lanes, access_mask, sign = self.access(mnemonic)
+        mask, half, depth = self.mask, self.half, self.depth
+
+        def handler(pc):
+            address = regs[s] + imm
+            index = address // BYTES
+
+            if not 0 <= index < depth:
+                self.address_check(pc, index)
+
+            value = (memory[index] >> ((address & lanes) << 3)) & access_mask
+
+            if value & sign:
+                value -= access_mask + 1
+
+            regs[t] = ((value + half) & mask) - half
+            return pc + 1
+
+        return handler
+
+
+    def store(self, mnemonic, pc, fields):
+        regs, memory, cache, written = self.registers, self.memory, self.cache, self.written
+        s, t, imm = fields['rs'], fields['rt'], fields['imm']
+        lanes, access_mask, _ = self.access(mnemonic)
+        depth = self.depth
+
+        def handler(pc):
+            address = regs[s] + imm
+            index = address // BYTES
+
+            if not 0 <= index < depth:
+                self.address_check(pc, index)
+
+            shift = (address & lanes) << 3
+            memory[index] = (memory[index] & ~(access_mask << shift)) | ((regs[t] & access_mask) << shift)
+            cache[index] = None # the word may be code, so it is decoded again if it runs
+            written.add(index)
+            return pc + 1
+
+        return handler
+
+
+    def funci(self, mnemonic, pc, fields):
+        regs = self.registers
+        operation = OPERATIONS[mnemonic]
+        s, t, imm = fields['rs'], self.destination(fields['rt']), fields['imm']
+        mask, half = self.mask, self.half
+
+        def handler(pc):
+            regs[t] = ((operation(regs[s], imm) + half) & mask) - half
+            return pc + 1
+
+        return handler
+
+
+    def funcr(self, mnemonic, pc, fields):
+        regs = self.registers
+        operation = OPERATIONS[mnemonic]
+        s, t, d = fields['rs'], fields['rt'], self.destination(fields['rd'])
+        mask, half = self.mask, self.half
+
+        def handler(pc):
+            regs[d] = ((operation(regs[s], regs[t]) + half) & mask) - half
+            return pc + 1
+
+        return handler
+
+
+    def register_lines(self):
+        digits = self.width // 4
+
+        for number, value in enumerate(self.registers[:SCRATCH]):
+            name = disassemble.REGISTER_NAMES.get(number, 'R{0}'.format(number))
+            yield '{0:>4} = {1} ({2})'.format(name, generate.hex_str(value & self.mask, digits), value)
+
+
+    def memory_lines(self):
+        digits = self.width // 4
+
+        for index in sorted(self.written):
+            yield '{0} : {1};'.format(generate.hex_str(index * BYTES), generate.hex_str(self.memory[index], digits))
+
+
+HANDLERS = {
+    isa.BRANCH: Simulator.branch,
+    isa.JUMP: Simulator.jump,
+    isa.LOAD: Simulator.load,
+    isa.STORE: Simulator.store,
+    isa.FUNCI: Simulator.funci,
+    isa.FUNCR: Simulator.funcr,
+}
+
+
+def load(program, engine='table', depth=generate.DEPTH, width=generate.WIDTH):
+    if program.lower().endswith('.mif'):
+        with open(program) as f:
+            return Simulator.from_mif(f)
+
+    assembled = assembler.Assembler(engine, depth, width).assemble_file(program)
+    return Simulator.from_image(assembled.memory, depth, width)
+
+
+def main(program, steps=STEPS, start=0, engine='table', depth=generate.DEPTH, width=generate.WIDTH, trace=None):
+    sim = load(program, engine, depth, width)
+    sim.pc = start // BYTES
+    started = time.perf_counter()
+
+    try:
+        halted = sim.run_counted(steps) if trace else sim.run(steps)
+        print('halted at {0}'.format(generate.hex_str(sim.pc * BYTES)) if halted else 'stopped after {0} steps at {1}'.format(steps, generate.hex_str(sim.pc * BYTES)))
+    except SimulationException as e:
+        print('Error: {0}'.format(str(e)))
+        return 1
+    finally:
+        elapsed = time.perf_counter() - started
+
+        if trace:
+            output.write_output(sim.trace_lines(), trace)
+
+        print('\n'.join(sim.register_lines()))
+        print('\n'.join(sim.memory_lines()))
+        print('{0} instructions in {1:.3f}s ({2:.2f}M/s)'.format(sim.steps, elapsed, sim.steps / elapsed / 1e6 if elapsed else 0), file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    try:
+        sys.exit(main(args.program, args.steps, args.start, args.parser, args.depth, args.width, args.trace))
+    except assembler.ERRORS as e:
+        print(assembler.describe_error(e), file=sys.stderr)
+        sys.exit(1)
+    except mif.MifException as e:
+        print('Error: {0}'.format(str(e)), file=sys.stderr)
+        sys.exit(1)